@@ -0,0 +1,59 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+ANSWER_CACHE_SIZE = int(os.environ.get("DIVA_ANSWER_CACHE_SIZE", 10000))
+
+PUNCTUATION = re.compile(r"[^\w\s'-]")
+# "is this a fruit", "is the object an animal", "does this thing have wheels" -> "is it fruit", ...
+SUBJECT = re.compile(r"^(is|does|can|could|would|will|was|has) (it|this|that|the object|the thing)( object| thing)? (an? |the )?")
+
+
+def normalize_question(question):
+    """Lowercases, strips punctuation and collapses the ways students refer to the object."""
+    text = " ".join(PUNCTUATION.sub(" ", question.lower()).split())
+    return SUBJECT.sub(lambda match: f"{match.group(1)} it ", text).strip()
+
+
+class AnswerCache:
+    """Shared LRU cache of minigame answers keyed on (secret object, normalized question)."""
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._answers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, secret_object, question):
+        return secret_object.lower(), normalize_question(question)
+
+    def get(self, secret_object, question):
+        """Returns the cached answer, or None on a miss."""
+        key = self._key(secret_object, question)
+        with self._lock:
+            answer = self._answers.get(key)
+            if answer is None:
+                self.misses += 1
+                return None
+            self._answers.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def put(self, secret_object, question, answer):
+        key = self._key(secret_object, question)
+        with self._lock:
+            self._answers[key] = answer
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._answers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
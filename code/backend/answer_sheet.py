@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from backend.answer_cache import normalize_question
+from backend.background import run_in_background
+
+ANSWER_SHEET_CACHE_SIZE = int(os.environ.get("DIVA_ANSWER_SHEET_CACHE_SIZE", 2000))
+
+
+def is_it(predicate):
+    """Template for "is it <predicate>" (after normalize_question), e.g. "is it usually small", "is it a small thing"."""
+    return rf"(is it|are they)( usually| typically| often| normally)? ({predicate})( object| thing| item)?"
+
+
+# The property categories from the minigame system prompt: key, what the model is asked,
+# the whole (normalized) questions that ask exactly that, and the replies for "yes" and "no".
+CATEGORIES = [
+    ("holdable", "can be held or carried by one person",
+     r"(can|could) (you|i|someone|a person|one person) (hold|carry|grab|pick up|lift) it( in one hand| with one hand)?"
+     r"|can it be (held|carried)( by one person| in one hand)?|(can|does|will|would) it fit in (your|my|a|one) (hand|pocket)",
+     "Yes, this object can be held. 😏", "No, this object is too big to be carried. 😏"),
+    ("large", "is large (bigger than a person)", is_it("big|large|huge|giant|very big"),
+     "Yes, this object is large. 😏", "No, this object isn't large. 😏"),
+    ("small", "is small enough to fit in a hand", is_it("small|tiny|little|very small"),
+     "Yes, this object is small and easy to carry. 😏", "No, this object isn't small. 😏"),
+    ("metal", "is made of or contains metal",
+     is_it("metal|metallic|made of metal|made out of metal") + r"|does it (have|contain) (any )?metal( parts| in it)?",
+     "Yes, this object contains metal. 😏", "No, this object isn't made of metal. 😏"),
+    ("wheels", "has wheels", r"does it have (any )?wheels?|" + is_it("on wheels"),
+     "Yes, this object has wheels. 😏", "No, this object does not have wheels. 😏"),
+    ("electronic", "uses electricity",
+     is_it("electronic|electric|electrical|battery powered|battery-powered|powered by electricity|plugged in")
+     + r"|does it (use|need|run on|require) (electricity|batteries|a battery|power)|(does it|do you|can you) plug (it )?in",
+     "Yes, this object uses electricity. 😏", "No, this object doesn't use electricity. 😏"),
+    ("wearable", "can be worn",
+     r"(can|do|would) (you|i|people) wear it|can it be worn|" + is_it("wearable|clothing|piece of clothing|something you wear"),
+     "Yes, this object can be worn. 😏", "No, this object is not something you would wear. 😏"),
+    ("colorful", "is typically bright or colorful", is_it("colorful|colourful|bright|brightly colou?red"),
+     "Yes, this object is typically bright or colorful. 😏", "No, this object isn't especially colorful. 😏"),
+    ("smell", "has a strong or distinctive smell",
+     r"does it (smell|stink|have (a )?(strong |distinctive )?(smell|scent|odou?r))|" + is_it("smelly|stinky"),
+     "Yes, this object has a distinctive odor. 😏", "No, this object doesn't have a strong smell. 😏"),
+    ("transparent", "is see-through",
+     is_it("transparent|see-through|see through") + r"|can (you|i) see through it",
+     "Yes, this object is see-through. 😏", "No, this object isn't see-through. 😏"),
+    ("reflective", "reflects light or images",
+     is_it("reflective|shiny") + r"|does it reflect( light| things| images)?",
+     "Yes, this object can reflect light or images. 😏", "No, this object isn't reflective. 😏"),
+    ("natural", "occurs in nature",
+     is_it("natural|found in nature|from nature") + r"|does it (occur|grow) (in nature|naturally)",
+     "Yes, this object occurs in nature. 😏", "No, this object doesn't occur in nature. 😏"),
+    ("human_made", "is manufactured by humans",
+     is_it("man-made|manmade|man made|human-made|human made|manufactured|made by (humans|people)"),
+     "Yes, this object is manufactured by humans. 😏", "No, this object isn't made by humans. 😏"),
+    ("handmade", "can be made by hand",
+     is_it("handmade|hand-made|handcrafted|made by hand") + r"|can it be made by hand|can (you|i) make it by hand",
+     "Yes, this object can be made by hand. 😏", "No, this object isn't usually made by hand. 😏"),
+    ("mass_produced", "is typically mass-produced", is_it("mass-produced|mass produced|made in (a )?factor(y|ies)"),
+     "Yes, this object is typically mass-produced. 😏", "No, this object isn't mass-produced. 😏"),
+    ("entertainment", "is used for entertainment",
+     is_it("toy|entertaining|for entertainment|for fun|used for (entertainment|fun)"),
+     "Yes, this object is used for entertainment. 😏", "No, this object isn't for entertainment. 😏"),
+    ("communication", "can be used for communication",
+     is_it("used for communication|used to communicate|for communication")
+     + r"|can (you|i|people) communicate with it",
+     "Yes, this object can be used for communication. 😏", "No, this object isn't used for communication. 😏"),
+    ("decorative", "is often used for decoration",
+     is_it("decorative|decoration|used (for|as) (a )?decoration|used to decorate"),
+     "Yes, this object is often used for decoration. 😏", "No, this object isn't decorative. 😏"),
+    ("tool", "is a tool", is_it("tool"),
+     "Yes, this object is a tool. 😏", "No, this object isn't a tool. 😏"),
+    ("cooking", "is used in cooking",
+     is_it("used (for|in) (cooking|baking)|used to (cook|bake)|for cooking")
+     + r"|(can|do) (you|i|people) (cook|bake) with it",
+     "Yes, this object is used in cooking. 😏", "No, this object isn't used in cooking. 😏"),
+    ("expensive", "is typically expensive",
+     is_it("expensive|costly|pricey") + r"|does it cost (a lot|much)( of money)?",
+     "Yes, this object is typically expensive. 😏", "No, this object isn't usually expensive. 😏"),
+    ("household", "is found in most homes",
+     is_it("household|found in (most|every) (homes|houses)|in (most|every) (homes|houses)"),
+     "Yes, this object is found in most homes. 😏", "No, this object isn't found in most homes. 😏"),
+    ("seasonal", "is associated with a specific season",
+     is_it("seasonal|associated with a (specific |certain |particular )?(season|holiday)"
+           "|used (only )?(in|during|at) (summer|winter|christmas|the holidays)"),
+     "Yes, this object is associated with specific seasons. 😏", "No, this object isn't tied to a season. 😏"),
+    ("recyclable", "can be recycled", is_it("recyclable") + r"|can it be recycled|can (you|i) recycle it",
+     "Yes, this object can be recycled. 😏", "No, this object usually can't be recycled. 😏"),
+    ("biodegradable", "naturally decomposes",
+     is_it("biodegradable") + r"|(does|will|can) it (decompose|rot|biodegrade)( naturally)?",
+     "Yes, this object will naturally decompose. 😏", "No, this object won't naturally decompose. 😏"),
+    ("modern", "is a modern invention", is_it("modern|modern invention|new invention|recent invention"),
+     "Yes, this object is a modern invention. 😏", "No, this object isn't a modern invention. 😏"),
+    ("ancient", "has existed for centuries",
+     is_it("ancient|ancient invention|old invention|very old") + r"|has it (existed|been around) for centuries",
+     "Yes, this object has existed for centuries. 😏", "No, this object hasn't been around for centuries. 😏"),
+    ("food", "is a type of food",
+     is_it("food|edible|eaten|something (you|people) (can )?eat") + r"|(can|do) (you|i|people) eat it|can it be eaten",
+     "Yes, this object is a type of food. 😏", "No, this object is not food. 😏"),
+    ("alive", "is a living thing", is_it("alive|living|living (being|creature)") + r"|does it breathe",
+     "Yes, this object is a living thing. 😏", "No, this object is not a living thing. 😏"),
+    ("moves", "can move on its own", r"(can|does) it move( on its own| by itself)?|" + is_it("moving"),
+     "Yes, this object can move independently. 😏", "No, this object can't move by itself. 😏"),
+    ("noise", "makes sounds", r"does it make (a )?(noise|noises|sound|sounds)|" + is_it("loud|noisy"),
+     "Yes, this object can make sounds. 😏", "No, this object doesn't make noise. 😏"),
+    ("indoors", "is typically found indoors", is_it("(found |used |kept )?(indoors|inside)"),
+     "Yes, this object is typically found indoors. 😏", "No, this object isn't usually found indoors. 😏"),
+    ("outdoors", "is typically found outdoors", is_it("(found |used |kept )?(outdoors|outside)"),
+     "Yes, this object is typically found outdoors. 😏", "No, this object isn't usually found outdoors. 😏"),
+]
+
+DEPENDS_REPLY = "It depends! This object can go either way on that one. 😏"
+ANSWERS = ("yes", "no", "depends")
+
+COMPILED_CATEGORIES = [(key, re.compile(pattern)) for key, _, pattern, _, _ in CATEGORIES]
+REPLIES = {key: {"yes": yes, "no": no, "depends": DEPENDS_REPLY} for key, _, _, yes, no in CATEGORIES}
+
+
+def match_category(question):
+    """Returns the category a whole question asks about, or None.
+
+    Patterns must match the entire normalized question, so anything with more to it ("is it a small animal",
+    "can you eat with it", negations, comparisons) is left to the model.
+    """
+    text = normalize_question(question)
+    matches = [key for key, pattern in COMPILED_CATEGORIES if pattern.fullmatch(text)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def answer_from_sheet(sheet, question):
+    """Answers a question from an object's answer sheet, or returns None if the sheet doesn't cover it."""
+    key = match_category(question)
+    if key is None or sheet.get(key) not in ANSWERS:
+        return None
+    return REPLIES[key][sheet[key]]
+
+
+def sheet_request(secret_object):
+    """Messages asking the model to fill in every category for the object in a single call."""
+    properties = "\n".join(f"- {key}: this object {description}" for key, description, _, _, _ in CATEGORIES)
+    return [
+        {"role": "system", "content":
+            "You fill in answer sheets for a 20 Questions game. For the given object, answer every property "
+            "with exactly one of \"yes\", \"no\" or \"depends\" (when it truly varies between instances). "
+            "Return a JSON object whose keys are the property names below.\n\n" + properties},
+        {"role": "user", "content": f"Object: {secret_object}"},
+    ]
+
+
+def parse_sheet(content):
+    """Keeps only known categories with valid answers from the model's JSON."""
+    data = json.loads(content)
+    known = {key for key, _, _, _, _ in CATEGORIES}
+    return {key: str(value).lower() for key, value in data.items() if key in known and str(value).lower() in ANSWERS}
+
+
+class AnswerSheets:
+    """Answer sheets per secret object, built once off the request path and shared by every session."""
+
+    def __init__(self, build, max_entries=ANSWER_SHEET_CACHE_SIZE):
+        self.build = build
+        self.max_entries = max_entries
+        self._sheets = OrderedDict()
+        self._building = set()
+        self._lock = threading.Lock()
+
+    def get(self, secret_object):
+        key = secret_object.lower()
+        with self._lock:
+            sheet = self._sheets.get(key)
+            if sheet is not None:
+                self._sheets.move_to_end(key)
+            return sheet
+
+    def prepare(self, secret_object):
+        """Builds and stores the sheet for an object unless it is already known or being built."""
+        key = secret_object.lower()
+        with self._lock:
+            if key in self._sheets or key in self._building:
+                return
+            self._building.add(key)
+        try:
+            sheet = self.build(secret_object)
+            with self._lock:
+                self._sheets[key] = sheet
+                while len(self._sheets) > self.max_entries:
+                    self._sheets.popitem(last=False)
+            logging.info("Answer sheet ready for %s: %d categories", secret_object, len(sheet))
+        except Exception as e:
+            logging.error("Error building answer sheet for %s: %s", secret_object, e)
+        finally:
+            with self._lock:
+                self._building.discard(key)
+
+    def prepare_in_background(self, secret_object):
+        run_in_background(self.prepare, secret_object)
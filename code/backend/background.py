@@ -0,0 +1,26 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Shared worker threads for upstream work that should not run on the request path
+BACKGROUND_WORKERS = int(os.environ.get("DIVA_BACKGROUND_WORKERS", 4))
+
+_executor = None
+_executor_pid = None
+
+
+def run_in_background(fn, *args, **kwargs):
+    """Runs fn on the shared background executor and logs (rather than raises) its errors."""
+    global _executor, _executor_pid
+    # Executor threads don't survive a fork, so each gunicorn worker gets its own
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="diva-background")
+        _executor_pid = os.getpid()
+    future = _executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logging.error("Background task failed", exc_info=future.exception())
@@ -0,0 +1,152 @@
+"""Curated catalog of secret objects, indexed by category and difficulty.
+
+The catalog is a JSON list of {"name", "category", "difficulty"} entries loaded once at startup, so choosing
+an object needs no network. The model is only used offline, to suggest new entries:
+
+    python -m backend.catalog --enrich 20
+"""
+import argparse
+import json
+import logging
+import os
+import random
+
+CATALOG_PATH = os.environ.get("DIVA_OBJECT_CATALOG",
+                              os.path.join(os.path.dirname(__file__), "data", "secret_objects.json"))
+DIFFICULTIES = ("easy", "medium", "hard")
+# Draws retried when they land on a recent object; bounded so a draw stays constant time
+DRAW_ATTEMPTS = 8
+
+
+class ObjectCatalog:
+    """Secret objects with O(1) random draws by category and/or difficulty that avoid recent repeats.
+
+    recent is a recent-objects store (see backend.recent_objects); draws are recorded in it per scope.
+    """
+
+    def __init__(self, entries, recent):
+        self.entries = entries
+        self.recent = recent
+        self._index = {}
+        self._categories = {entry["name"].lower(): entry["category"] for entry in entries}
+        for entry in entries:
+            for key in ((None, None), (entry["category"], None), (None, entry["difficulty"]),
+                        (entry["category"], entry["difficulty"])):
+                self._index.setdefault(key, []).append(entry["name"])
+
+    @classmethod
+    def load(cls, recent, path=CATALOG_PATH):
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        logging.info("Loaded %d secret objects from %s", len(entries), path)
+        return cls(entries, recent)
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def categories(self):
+        return sorted({category for category, difficulty in self._index if category is not None})
+
+    def category_of(self, name):
+        return self._categories.get(name.lower())
+
+    def draw(self, category=None, difficulty=None, scope="default"):
+        """Picks a random object not drawn recently in this scope. Unknown filters fall back to the whole catalog."""
+        candidates = self._index.get((category, difficulty)) or self._index[(None, None)]
+        for _ in range(DRAW_ATTEMPTS):
+            name = random.choice(candidates)
+            if not self.recent.is_recent(scope, name):
+                break
+        self.recent.add(scope, name)
+        return name
+
+    def draw_many(self, count, category=None, difficulty=None, scope="default"):
+        """Picks count distinct objects, preferring ones not drawn recently in this scope.
+
+        Objects only repeat once count exceeds the candidates.
+        """
+        candidates = self._index.get((category, difficulty)) or self._index[(None, None)]
+        shuffled = random.sample(candidates, len(candidates))
+        names = []
+        for name in shuffled:
+            if len(names) == count:
+                break
+            if not self.recent.is_recent(scope, name):
+                names.append(name)
+        if len(names) < count:
+            chosen = set(names)
+            names.extend(name for name in shuffled if name not in chosen)
+        while len(names) < count:
+            names.extend(shuffled[:count - len(names)])
+        names = names[:count]
+        for name in names:
+            self.recent.add(scope, name)
+        return names
+
+
+def enrichment_request(entries, count):
+    """Messages asking the model for new catalog entries that aren't in it yet."""
+    known = ", ".join(entry["name"] for entry in entries)
+    return [
+        {"role": "system", "content":
+            "You suggest objects for a 20 Questions game played by students. Every object must be a specific, "
+            "concrete noun of 1-2 words that is physical, widely recognizable across cultures and age groups, "
+            "and guessable within 20 yes/no questions. Avoid abstract concepts, proper names, brands and "
+            "fictional characters. Return a JSON object of the form "
+            '{"objects": [{"name": "...", "category": "...", "difficulty": "easy|medium|hard"}]}.'},
+        {"role": "user", "content": f"Suggest {count} new objects. Use these categories where they fit: "
+                                    f"{', '.join(sorted({entry['category'] for entry in entries}))}. "
+                                    f"Already in the catalog: {known}"},
+    ]
+
+
+def parse_enrichment(content, entries):
+    """Keeps well-formed suggestions that aren't already in the catalog."""
+    known = {entry["name"].lower() for entry in entries}
+    new_entries = []
+    for entry in json.loads(content).get("objects", []):
+        name = str(entry.get("name", "")).strip().lower()
+        if not name or len(name.split()) > 2 or name in known or entry.get("difficulty") not in DIFFICULTIES:
+            continue
+        known.add(name)
+        new_entries.append({"name": name, "category": str(entry.get("category", "")).strip().lower() or "misc",
+                            "difficulty": entry["difficulty"]})
+    return new_entries
+
+
+def main():
+    from dotenv import load_dotenv
+    from openai import OpenAI
+
+    parser = argparse.ArgumentParser(description="Suggest new catalog entries with the model and append them.")
+    parser.add_argument("--enrich", type=int, default=20, help="how many objects to ask for")
+    parser.add_argument("--path", default=CATALOG_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="print the suggestions without saving them")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = OpenAI(api_key=os.getenv("DIVA_API_KEY"), base_url=os.getenv("DIVA_API_BASE_URL") or None)
+    with open(args.path, encoding="utf-8") as f:
+        entries = json.load(f)
+
+    chat_completion = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        temperature=1.0,
+        response_format={"type": "json_object"},
+        messages=enrichment_request(entries, args.enrich)
+    )
+    new_entries = parse_enrichment(chat_completion.choices[0].message.content, entries)
+    for entry in new_entries:
+        print(f"{entry['name']:<24} {entry['category']:<14} {entry['difficulty']}")
+    if args.dry_run or not new_entries:
+        return
+
+    entries.extend(new_entries)
+    with open(args.path, "w", encoding="utf-8") as f:
+        f.write("[\n" + ",\n".join("  " + json.dumps(entry) for entry in entries) + "\n]\n")
+    print(f"Added {len(new_entries)} objects to {args.path} ({len(entries)} total)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+
+# Input tokens allowed per /api/chat request, system prompt and summary included
+CHAT_TOKEN_BUDGET = int(os.environ.get("DIVA_CHAT_TOKEN_BUDGET", 1200))
+
+# Per-message framing the chat API adds on top of the content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "You keep a running summary of a conversation between a student and Ai Diva, a sassy but kind AI assistant. "
+    "Update the summary with the new messages. Keep names, facts, preferences and open questions the student "
+    "mentioned; drop small talk. Write at most 120 words, in the third person, with no preamble."
+)
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English)."""
+    return len(text) // 4 + MESSAGE_OVERHEAD_TOKENS
+
+
+def summary_message(summary):
+    return {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+
+
+def window_messages(history, summary="", budget=CHAT_TOKEN_BUDGET):
+    """Picks the messages to send: the system prompt, the rolling summary and as many recent turns as fit.
+
+    history starts with the system prompt. Returns (messages, dropped), where dropped is how many of the
+    oldest turns did not fit and should be folded into the summary. The newest turn is always kept.
+    """
+    system, turns = history[0], history[1:]
+    head = [system]
+    if summary:
+        head.append(summary_message(summary))
+    remaining = budget - sum(estimate_tokens(message["content"]) for message in head)
+
+    start = len(turns)
+    while start > 0:
+        cost = estimate_tokens(turns[start - 1]["content"])
+        if cost > remaining and start < len(turns):
+            break
+        remaining -= cost
+        start -= 1
+    return head + turns[start:], start
+
+
+def summary_request(summary, turns):
+    """Messages asking the model to fold turns into the existing summary."""
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in turns)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Current summary: {summary or '(none)'}\n\nNew messages:\n{transcript}"},
+    ]
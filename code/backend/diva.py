@@ -1,21 +1,34 @@
 import os
+import hmac
+import json
 import logging
-import random
-import re
+import time
 import uuid
 from datetime import timedelta
 
-from flask import Flask, request, jsonify, session
+from flask import Flask, Response, g, has_request_context, request, jsonify, session
 from flask_cors import CORS
-from openai import OpenAI
 from dotenv import load_dotenv
-import spacy
-import spacy.cli
-import nltk
-from nltk.tokenize import word_tokenize
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+from backend.answer_cache import AnswerCache
+from backend.answer_sheet import AnswerSheets, answer_from_sheet, parse_sheet, sheet_request
+from backend.background import run_in_background
+from backend.catalog import ObjectCatalog
+from backend.chat_context import summary_request, window_messages
+from backend.guesses import GuessMatcher
+from backend.hints import HINT_LOW_WATER, hint_batch_request, local_hint, parse_hints
+from backend.logs import dropped_records, request_log, sampled, session_log, setup_logging
+from backend.metrics import (IS_QUESTION_SECONDS, REQUEST_SECONDS, UPSTREAM_ERRORS, record_lookup, record_usage,
+                             render as render_metrics, route_label, sessions_gauge)
+from backend.nlp import PARSER_ONLY_EXCLUDE, QuestionDetector, load_spacy_model
+from backend.object_pool import SecretObjectPool
+from backend.prompts import render_minigame_prompt
+from backend.recent_objects import create_recent_objects
+from backend.session_store import create_session_store
+from backend.upstream import Upstream, UpstreamUnavailable, create_client
+
+# Setup logging: records go through a queue to a writer thread, verbose session dumps only with DIVA_DEBUG_SESSIONS
+setup_logging()
 
 # Initialize Flask app and CORS
 app = Flask(__name__)
@@ -31,27 +44,256 @@ app.config['SESSION_COOKIE_HTTPONLY'] = False
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize OpenAI client
-client_diva = OpenAI(api_key=os.getenv("DIVA_API_KEY"))
+# Initialize OpenAI client. One client (and its keep-alive pool, see backend/upstream.py) is shared by every
+# request in the process; in async serving mode (see gunicorn.conf.py) its sockets yield to other requests while waiting.
+# DIVA_API_BASE_URL points it at another chat completions server, e.g. `python -m backend.mock_llm`, and
+# DIVA_LLM_PROVIDER=mock answers in-process with backend.mock_llm, so no key or network is needed.
+client_diva = create_client(api_key=os.getenv("DIVA_API_KEY"), base_url=os.getenv("DIVA_API_BASE_URL") or None)
 
+def add_upstream_time(call_site, seconds):
+    """Adds an upstream call's time to the current request, for its Server-Timing header."""
+    if has_request_context():
+        g.upstream_seconds = g.get("upstream_seconds", 0.0) + seconds
 
-# Download and load NLP models for the minigame (if not already installed)
-spacy.cli.download("en_core_web_sm")
-nlp = spacy.load("en_core_web_sm")
-nltk.download("punkt")
+# Every completion goes through here so it is timed, its token usage counted and its retries bounded
+upstream = Upstream(client_diva, observe=add_upstream_time)
+
+# Upstream calls made for a request give up (retries included) this many seconds after it arrived,
+# safely inside gunicorn's 30 second worker timeout
+REQUEST_DEADLINE = float(os.environ.get("DIVA_REQUEST_DEADLINE", 25))
+
+# Instructors provision a classroom's sessions ahead of a workshop (POST /api/classroom); off unless a token is set
+INSTRUCTOR_TOKEN = os.environ.get("DIVA_INSTRUCTOR_TOKEN", "")
+MAX_CLASSROOM_SIZE = int(os.environ.get("DIVA_MAX_CLASSROOM_SIZE", 60))
+
+
+# Load the NLP model for the minigame once; it must already be installed (see requirements.txt).
+# Only the dependency parser is kept since is_question() reads nothing else.
+nlp = load_spacy_model(exclude=PARSER_ONLY_EXCLUDE)
+question_detector = QuestionDetector(nlp)
 
 # ==================== USER SESSION MANAGEMENT ====================
-# Dictionary to store user sessions
-user_sessions = {}
+# Where sessions live: "sqlite" (default) is shared by every gunicorn worker on the machine,
+# "memory" keeps them inside a single process
+SESSION_BACKEND = os.environ.get("DIVA_SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = os.environ.get("DIVA_SESSION_DB", "diva_sessions.sqlite3")
+# Eviction limits: idle time in seconds, number of sessions and total (approximate) bytes kept
+SESSION_TTL = int(os.environ.get("DIVA_SESSION_TTL", 6 * 3600))
+MAX_SESSIONS = int(os.environ.get("DIVA_MAX_SESSIONS", 5000))
+MAX_SESSION_BYTES = int(os.environ.get("DIVA_MAX_SESSION_BYTES", 64 * 1024 * 1024))
+SESSION_CLEANUP_INTERVAL = int(os.environ.get("DIVA_SESSION_CLEANUP_INTERVAL", 60))
+
+class ChatState:
+    """State for /api/chat: Diva's conversation, word budget and a summary of turns folded out of history.
+
+    folded counts every turn folded into the summary so far.
+    """
+    __slots__ = ("word_count", "history", "summary", "folded")
+
+    def __init__(self):
+        self.word_count = 0
+        self.history = [{"role": "system", "content": diva_system_message}]
+        self.summary = ""
+        self.folded = 0
+
+    # The system prompt is never serialized; it is put back when the state is loaded
+    def to_dict(self):
+        return {"word_count": self.word_count, "history": self.history[1:], "summary": self.summary,
+                "folded": self.folded}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls()
+        state.word_count = data["word_count"]
+        state.history.extend(data["history"])
+        state.summary = data.get("summary", "")
+        state.folded = data.get("folded", 0)
+        return state
+
+    def absorb(self, stored):
+        """Takes over a summary that refresh_chat_summary stored after this copy was loaded, dropping exactly
+        the turns it folded in from the front of this copy's history."""
+        if stored.folded <= self.folded:
+            return
+        del self.history[1:1 + stored.folded - self.folded]
+        self.summary = stored.summary
+        self.folded = stored.folded
+
+class MinigameState:
+    """State for the 20 Questions minigame. Creating it draws a secret object.
+
+    answer_sheet holds the object's precomputed property answers once they are available.
+    hints holds every hint generated for the object, in order; the first hints_given were already shown.
+    game_id identifies this game in the student's cookie, and changes whenever a new game starts.
+    """
+    __slots__ = ("game_id", "question_count", "secret_object", "chat_history", "answer_sheet", "hints",
+                 "hints_given")
+
+    def __init__(self, secret_object=None):
+        self.game_id = uuid.uuid4().hex
+        self.question_count = 0
+        self.secret_object = secret_object or secret_object_pool.pop()
+        self.chat_history = [{"role": "system", "content": minigame_system_message}]
+        self.answer_sheet = None
+        self.hints = []
+        self.hints_given = 0
+
+    @property
+    def pending_hints(self):
+        return len(self.hints) - self.hints_given
+
+    def next_hint(self):
+        hint = self.hints[self.hints_given]
+        self.hints_given += 1
+        return hint
+
+    def to_dict(self):
+        return {"game_id": self.game_id, "question_count": self.question_count, "secret_object": self.secret_object,
+                "chat_history": self.chat_history[1:], "answer_sheet": self.answer_sheet,
+                "hints": self.hints, "hints_given": self.hints_given}
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data["secret_object"])
+        state.game_id = data.get("game_id", state.game_id)
+        state.question_count = data["question_count"]
+        state.chat_history.extend(data["chat_history"])
+        state.answer_sheet = data.get("answer_sheet")
+        state.hints = data.get("hints", [])
+        state.hints_given = data.get("hints_given", 0)
+        return state
+
+    def absorb(self, stored):
+        """Takes over an answer sheet or hints that background tasks stored after this copy was loaded."""
+        if stored.secret_object != self.secret_object:
+            return
+        if self.answer_sheet is None:
+            self.answer_sheet = stored.answer_sheet
+        if len(stored.hints) > len(self.hints) and stored.hints[:len(self.hints)] == self.hints:
+            self.hints = stored.hints
 
 class UserSession:
+    """A user's state, split into feature sections that are only built on first use.
+
+    version is the stored version this copy was loaded at (None until it is stored), see session_store.
+    """
+    __slots__ = ("id", "_chat", "_minigame", "version")
+
     def __init__(self):
         self.id = str(uuid.uuid4())
-        self.diva_word_count = 0
-        self.diva_chat_history = [{"role": "system", "content": diva_system_message}]
-        self.question_count = 0
-        self.secret_object = generate_secret_object()
-        self.game_chat_history = [{"role": "system", "content": minigame_system_message}]
+        self._chat = None
+        self._minigame = None
+        self.version = None
+
+    @property
+    def chat(self):
+        if self._chat is None:
+            self._chat = ChatState()
+        return self._chat
+
+    @property
+    def minigame(self):
+        if self._minigame is None:
+            self._minigame = MinigameState()
+        return self._minigame
+
+    @property
+    def has_minigame(self):
+        return self._minigame is not None
+
+    def approx_size(self):
+        """Rough bytes held by this session, used for the session store's memory budget."""
+        size = 256
+        if self._chat is not None:
+            size += len(self._chat.summary)
+            size += sum(len(message["content"]) + 64 for message in self._chat.history[1:])
+        if self._minigame is not None:
+            size += sum(len(message["content"]) + 64 for message in self._minigame.chat_history[1:])
+            size += sum(len(hint) + 64 for hint in self._minigame.hints)
+        return size
+
+    def to_dict(self):
+        """Only the sections that were actually used are serialized."""
+        data = {"id": self.id}
+        if self._chat is not None:
+            data["chat"] = self._chat.to_dict()
+        if self._minigame is not None:
+            data["minigame"] = self._minigame.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        user_session = cls.__new__(cls)
+        user_session.id = data["id"]
+        user_session._chat = ChatState.from_dict(data["chat"]) if "chat" in data else None
+        user_session._minigame = MinigameState.from_dict(data["minigame"]) if "minigame" in data else None
+        user_session.version = None
+        return user_session
+
+    def absorb(self, stored):
+        """Pulls what background tasks stored since this copy was loaded into it, so saving it keeps them."""
+        for name in ("_chat", "_minigame"):
+            mine, theirs = getattr(self, name), getattr(stored, name)
+            if mine is None:
+                setattr(self, name, theirs)
+            elif theirs is not None:
+                mine.absorb(theirs)
+
+    # Flat attribute names used by the endpoints, mapped onto the feature sections
+    @property
+    def diva_word_count(self):
+        return self.chat.word_count
+
+    @diva_word_count.setter
+    def diva_word_count(self, value):
+        self.chat.word_count = value
+
+    @property
+    def diva_chat_history(self):
+        return self.chat.history
+
+    @diva_chat_history.setter
+    def diva_chat_history(self, value):
+        self.chat.history = value
+
+    @property
+    def question_count(self):
+        return self.minigame.question_count
+
+    @question_count.setter
+    def question_count(self, value):
+        self.minigame.question_count = value
+
+    @property
+    def secret_object(self):
+        return self.minigame.secret_object
+
+    @secret_object.setter
+    def secret_object(self, value):
+        # Setting the object directly must not draw (and waste) one from the pool
+        if self._minigame is None:
+            self._minigame = MinigameState(value)
+        elif self._minigame.secret_object != value:
+            self._minigame.secret_object = value
+            self._minigame.answer_sheet = None
+            self._minigame.hints = []
+            self._minigame.hints_given = 0
+
+    @property
+    def game_chat_history(self):
+        return self.minigame.chat_history
+
+    @game_chat_history.setter
+    def game_chat_history(self, value):
+        self.minigame.chat_history = value
+
+# Active sessions for /api/metrics. A SQLite store is shared by every worker and counted when metrics are
+# scraped; a memory store is per worker and counted after each request (len() is O(1) there).
+SESSIONS_SHARED = SESSION_BACKEND == "sqlite"
+active_sessions = sessions_gauge(shared=SESSIONS_SHARED)
+
+user_sessions = create_session_store(SESSION_BACKEND, UserSession, SESSION_DB_PATH, ttl=SESSION_TTL,
+                                     max_sessions=MAX_SESSIONS, max_bytes=MAX_SESSION_BYTES)
 
 # System message defines Ai Diva's personality for the chat endpoint
 diva_system_message = """
@@ -78,11 +320,25 @@ You are playing the 20 Questions Game. You will think of an object/term (common,
 The user will guess what you are thinking of by asking up to 20 yes/no questions. You can only answer with "yes" or "no," but you can add some sass to your responses.
 """
 
-# Create a set to track used objects across all users
-previous_objects = set()
+# Answers to minigame questions, shared by everyone who gets the same secret object
+answer_cache = AnswerCache()
 
 TOTAL_WORD_LIMIT = 2500
 MAX_QUESTIONS = 20
+SECRET_OBJECT_POOL_SIZE = int(os.environ.get("SECRET_OBJECT_POOL_SIZE", 8))
+
+# Curated secret objects, loaded once at startup. Optionally restricted to one category or difficulty.
+SECRET_OBJECT_CATEGORY = os.environ.get("DIVA_OBJECT_CATEGORY") or None
+SECRET_OBJECT_DIFFICULTY = os.environ.get("DIVA_OBJECT_DIFFICULTY") or None
+
+# Draws avoid the last RECENT_OBJECTS objects of the deployment, for up to RECENT_OBJECTS_TTL seconds.
+# With the sqlite backend the window is shared by every worker and survives restarts.
+RECENT_OBJECTS = int(os.environ.get("DIVA_RECENT_OBJECTS", 50))
+RECENT_OBJECTS_TTL = int(os.environ.get("DIVA_RECENT_OBJECTS_TTL", 24 * 3600))
+RECENT_OBJECTS_SCOPE = os.environ.get("DIVA_RECENT_OBJECTS_SCOPE", "default")
+recent_objects = create_recent_objects(SESSION_BACKEND, SESSION_DB_PATH, window=RECENT_OBJECTS, ttl=RECENT_OBJECTS_TTL)
+object_catalog = ObjectCatalog.load(recent_objects)
+guess_matcher = GuessMatcher(object_catalog.entries)
 
 # ==================== Helper Functions ====================
 def get_user_session():
@@ -90,36 +346,138 @@ def get_user_session():
     global user_session
     user_id = request.cookies.get('user_id')
 
-    # Log detailed information about the request
-    logging.info("==== SESSION DEBUG ====")
-    logging.info(f"Request path: {request.path}")
-    logging.info(f"Request headers: {dict(request.headers)}")
-    logging.info(f"Request cookies: {dict(request.cookies)}")
-    logging.info(f"Got user_id from cookie: {user_id}")
-    logging.info(f"Current active sessions: {len(user_sessions)}")
+    # Verbose request and session dumps, only built when DIVA_DEBUG_SESSIONS is on
+    if session_log.isEnabledFor(logging.DEBUG):
+        session_log.debug("Request path: %s", request.path)
+        session_log.debug("Request headers: %s", dict(request.headers))
+        session_log.debug("Request cookies: %s", dict(request.cookies))
+        session_log.debug("Current active sessions: %d", len(user_sessions))
 
     # Check if we have this user ID in our sessions
-    if user_id and user_id in user_sessions:
-        logging.info(f"Found existing session for user_id: {user_id}")
-        user_session = user_sessions[user_id]
-        logging.info(f"User session secret object: {user_session.secret_object}")
+    user_session = load_user_session(user_id)
+    if user_session:
+        session_log.debug("Found existing session for user_id: %s", user_id)
     else:
         if not user_id:
-            logging.warning("No user_id cookie found - creating new session")
+            session_log.info("No user_id cookie found - creating new session")
             user_session = UserSession()
             user_id = user_session.id
-        elif user_id not in user_sessions:
-            logging.warning(f"User ID {user_id} not found in sessions dict - creating new session")
+        else:
+            session_log.info("User ID %s not found in session store - creating new session", user_id)
             user_session = UserSession()
             user_session.id =user_id
 
-        # Create a new session
-        user_sessions[user_id] = user_session
-        logging.info(f"Created new session with ID: {user_id}")
-        logging.info(f"New session secret object: {user_session.secret_object}")
+        # Create a new session; it is written to the store after the request
+        track_user_session(user_session)
+
+    return user_session, user_id
+
+def load_user_session(user_id):
+    """Loads a session from the store at most once per request. Returns None if it doesn't exist."""
+    if not user_id:
+        return None
+    loaded_sessions = g.setdefault("loaded_sessions", {})
+    if user_id not in loaded_sessions:
+        user_session = user_sessions.get(user_id)
+        if user_session is None:
+            return None
+        loaded_sessions[user_id] = user_session
+    return loaded_sessions[user_id]
+
+def track_user_session(user_session):
+    """Marks a newly created session to be written to the store after the request."""
+    g.setdefault("loaded_sessions", {})[user_session.id] = user_session
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.request_deadline = time.monotonic() + REQUEST_DEADLINE
+    g.upstream_seconds = 0.0
+
+def request_deadline():
+    """When upstream calls made for the current request must be done by, or None outside a request."""
+    return g.get("request_deadline") if has_request_context() else None
+
+@app.after_request
+def log_request(response):
+    """One structured access-log line per request, sampled per endpoint. Server errors are always logged.
+
+    The Server-Timing header splits the time spent so far into upstream calls and everything else (app),
+    so load tests can tell them apart. For a stream it covers opening the upstream stream.
+    """
+    endpoint = request.endpoint or "unknown"
+    elapsed = time.perf_counter() - g.get("request_start", time.perf_counter())
+    upstream_seconds = g.get("upstream_seconds", 0.0)
+    REQUEST_SECONDS.labels(route_label(endpoint)).observe(elapsed)
+    response.headers["Server-Timing"] = (f"app;dur={(elapsed - upstream_seconds) * 1000:.1f}, "
+                                         f"upstream;dur={upstream_seconds * 1000:.1f}")
+    if response.status_code >= 500 or sampled(endpoint):
+        request_log.info("request", extra={"fields": {
+            "endpoint": endpoint,
+            "method": request.method,
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 1),
+            "session": next(iter(g.get("loaded_sessions", {})), None),
+        }})
+    return response
+
+@app.after_request
+def save_user_sessions(response):
+    """Writes back every session the request loaded or created (one read-modify-write per request).
+
+    If a background task stored the session while the request ran, its results are merged in first.
+    Hint refills for new, reset or drained games start only once the game is stored, so they find it.
+    """
+    for user_id, user_session in g.get("loaded_sessions", {}).items():
+        if user_sessions.save(user_id, user_session, merge=UserSession.absorb) and user_session.has_minigame:
+            queue_hint_refill(user_session)
+    if not SESSIONS_SHARED:
+        active_sessions.set(len(user_sessions))
+    return response
 
-    logging.info("==== END SESSION DEBUG ====")
-    return user_sessions[user_id], user_id
+def build_chat_messages(user_session, user_id):
+    """Messages for Diva's next reply, trimmed to the token budget.
+
+    Turns that no longer fit are folded into the session's rolling summary by a background task,
+    so the request never waits on the summarization call.
+    """
+    chat = user_session.chat
+    messages, dropped = window_messages(chat.history, chat.summary)
+    if dropped and user_id not in summaries_in_progress:
+        summaries_in_progress.add(user_id)
+        run_in_background(refresh_chat_summary, user_id, chat.history[1:1 + dropped])
+    return messages
+
+# Users whose summary is being refreshed right now, so each gets at most one refresh at a time
+summaries_in_progress = set()
+
+def refresh_chat_summary(user_id, turns):
+    """Folds the given oldest turns into the user's summary and removes them from the stored history."""
+    try:
+        user_session = user_sessions.get(user_id)
+        if user_session is None:
+            return
+        chat_completion = upstream.complete(
+            "chat_summary",
+            model="gpt-3.5-turbo",
+            messages=summary_request(user_session.chat.summary, turns)
+        )
+        summary = chat_completion.choices[0].message.content.strip()
+
+        # Applied to the latest stored copy, since the user may have kept chatting while we waited on OpenAI
+        def fold(user_session):
+            chat = user_session.chat
+            if chat.history[1:1 + len(turns)] != turns:
+                logging.warning("Chat history for %s changed during summarization - skipping update", user_id)
+                return False
+            del chat.history[1:1 + len(turns)]
+            chat.summary = summary
+            chat.folded += len(turns)
+
+        if user_sessions.update(user_id, fold):
+            logging.info("Folded %d turns into the chat summary for %s", len(turns), user_id)
+    finally:
+        summaries_in_progress.discard(user_id)
 
 def apply_word_limit(text, remaining_words):
     """Truncate the text if it exceeds the remaining allowed words."""
@@ -129,140 +487,196 @@ def apply_word_limit(text, remaining_words):
         return truncated_text + "... [Response truncated due to word limit]", 0
     return text, remaining_words - len(words)
 
-def generate_secret_object():
-    """Generates a valid object to guess using OpenAI."""
-    max_attempts = 10  # Maximum number of attempts to get a unique object
-    attempts = 0
-    while attempts < max_attempts:
-        attempts += 1
-        try:
-            chat_completion = client_diva.chat.completions.create(
-                model="gpt-3.5-turbo",
-                temperature=1.0,  # Increased randomness
-                messages=[
-                    {"role": "system", "content":
-                        "You are a specialized 20 Questions game object generator. Your sole purpose is to select appropriate objects for the game. "
-                        "Follow these requirements precisely:\n\n"
-                        "1. Select a specific, concrete noun that is widely recognizable across cultures and age groups.\n"
-                        "2. The object must be something physical that can be seen or touched.\n"
-                        "3. Choose objects that are neither too broad (like 'furniture') nor too specific (like 'John's left shoe').\n"
-                        "4. Ideal objects should be guessable within 20 yes/no questions by most people.\n"
-                        "5. Examples of good objects: umbrella, coffee mug, wristwatch, tennis ball, bicycle, refrigerator, passport.\n"
-                        "6. Avoid abstract concepts, proper names, or fictional characters.\n"
-                        "7. Generate objects with moderate difficulty - not too obvious but not impossibly obscure.\n"
-                        "8. Ensure the object can be described with 1-2 words maximum.\n\n"
-                        "Output format: Return ONLY the object name with no additional text, explanations, or commentary. "
-                        "No quotation marks, no prefixes, and no acknowledgments."
-                     }
-                ]
-            )
-            object_choice = chat_completion.choices[0].message.content.strip()
-
-            # Validate: Ensure the object is short and unique.
-            if len(object_choice.split()) <= 3 and object_choice not in previous_objects:
-                previous_objects.add(object_choice)
-                logging.info(f"New secret object chosen -> {object_choice}")
-                return object_choice
-            else:
-                logging.warning(f"Duplicate or invalid object generated: {object_choice}. Retrying...")
-        except Exception as e:
-            logging.error(f"Error generating object: {e}")
-
-    # Fallback option if an error occurs
-    fallback_options = ["cat", "pizza", "phone", "tree", "Superman"]
-    for fallback in fallback_options:
-        if fallback not in previous_objects:
-            previous_objects.add(fallback)
-            return fallback
+WORD_LIMIT_SUFFIX = "... [Response truncated due to word limit]"
+# Served while the upstream circuit breaker is open
+NAPPING_REPLY = "Diva is napping right now 😴 Give her a minute and try again!"
+
+class StreamingWordLimit:
+    """Counts words in streamed text as it arrives and cuts it off at the remaining word budget."""
+
+    def __init__(self, remaining_words):
+        self.remaining_words = remaining_words
+        self.word_count = 0
+        self.truncated = False
+        self._in_word = False
+
+    def feed(self, text):
+        """Returns the part of text that fits in the budget. Sets truncated once a word goes over."""
+        for i, char in enumerate(text):
+            if char.isspace():
+                self._in_word = False
+            elif not self._in_word:
+                self._in_word = True
+                if self.word_count >= self.remaining_words:
+                    self.truncated = True
+                    return text[:i].rstrip()
+                self.word_count += 1
+        return text
+
+def sse_event(data, event=None):
+    """Formats one Server-Sent Event with a JSON payload."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
-    # If all fallback options are used, return one arbitrarily
-    return fallback_options[0]
+def generate_secret_object():
+    """Draws a secret object from the local catalog, avoiding recently used ones."""
+    return object_catalog.draw(SECRET_OBJECT_CATEGORY, SECRET_OBJECT_DIFFICULTY, RECENT_OBJECTS_SCOPE)
+
+def build_answer_sheet(secret_object):
+    """Asks OpenAI once for the answer to every property category of the object."""
+    chat_completion = upstream.complete(
+        "answer_sheet",
+        model="gpt-3.5-turbo",
+        temperature=0,
+        response_format={"type": "json_object"},
+        messages=sheet_request(secret_object)
+    )
+    return parse_sheet(chat_completion.choices[0].message.content)
+
+# Answer sheets per object, shared by every session that gets the same object
+answer_sheets = AnswerSheets(build_answer_sheet)
+
+# Pool of ready secret objects so new sessions and resets don't wait on their answer sheet.
+# Each pooled object already has its answer sheet.
+secret_object_pool = SecretObjectPool(generate_secret_object, generate_secret_object, size=SECRET_OBJECT_POOL_SIZE,
+                                      prepare=answer_sheets.prepare)
+secret_object_pool.start()
 
 def is_question(user_input):
-    """Detects if the given input is a yes/no question using NLP."""
-    doc = nlp(user_input)
-    question_words = {"who", "what", "when", "where", "why", "how", "is", "does", "do", "can", "could", "would", "should", "will", "are", "was", "were"}
-    if doc[0].text.lower() in question_words:
-        return True
-    if user_input.strip().endswith("?"):
-        return True
-    for token in doc:
-        if token.dep_ == "aux" and token.head.dep_ == "ROOT":
-            return True
-    return False
+    """Detects if the given input is a yes/no question, only parsing it with spaCy when needed."""
+    with IS_QUESTION_SECONDS.time():
+        return question_detector(user_input)
 
 def reset_game_for_user(user_session):
     """Resets game variables for a specific user session."""
     # Update custom session object
     user_session.question_count = 0
-    user_session.secret_object = generate_secret_object()
+    user_session.secret_object = secret_object_pool.pop()
     user_session.game_chat_history = [{"role": "system", "content": minigame_system_message}]
+    user_session.minigame.game_id = uuid.uuid4().hex
 
-    # ALSO store in Flask session for redundancy
+    # ALSO keep the counter in the Flask session. The signed cookie only carries the id of the server-side
+    # game and the counter, so it stays the same size however long the game runs.
+    session['game_id'] = user_session.minigame.game_id
     session['question_count'] = 0
-    session['secret_object'] = user_session.secret_object
-    session['game_chat_history'] = user_session.game_chat_history
 
-    logging.info(f"New secret object chosen for user {user_session.id}: {user_session.secret_object}")
-    logging.info(f"Game reset! New secret object chosen: {session.get('secret_object')}")
-    logging.info(f"SESSION DATA: {{'question_count': '{session.get('question_count')}', 'secret_object': '{session.get('secret_object')}', 'chat_history_game': '{session.get('game_chat_history')}'}}")
+    logging.info("New secret object chosen for user %s: %s", user_session.id, user_session.secret_object)
+    guess_matcher.alias_index(user_session.secret_object)
 
-def ensure_session_data():
-    """Verify session data exists and is valid. If not, restore from user_sessions or initialize."""
-    # Get user_id from cookie
-    user_id = request.cookies.get('user_id')
-
-    # Check if we have session data
-    if 'secret_object' not in session or 'question_count' not in session:
-        logging.warning("Missing session data - attempting to restore")
-
-        # Try to restore from user_sessions if possible
-        if user_id and user_id in user_sessions:
-            user_session = user_sessions[user_id]
-            session['question_count'] = user_session.question_count
-            session['secret_object'] = user_session.secret_object
-            session['game_chat_history'] = user_session.game_chat_history
-            logging.info(f"Restored session data from user_sessions for {user_id}")
-        else:
-            # Initialize new session data
-            secret_object = generate_secret_object()
-            session['question_count'] = 0
-            session['secret_object'] = secret_object
-            session['game_chat_history'] = [{"role": "system", "content": minigame_system_message}]
-            logging.info(f"Initialized new session data with object: {secret_object}")
+def ensure_session_data(user_session):
+    """Verify the Flask session counts questions for the user's current server-side game. If not, restore it
+    from there: the game may have been reset elsewhere, or the session evicted and recreated with a new game."""
+    # Cookies from older versions also carried the object and the whole game history, or the session id
+    session.pop('secret_object', None)
+    session.pop('game_chat_history', None)
+    session.pop('sid', None)
 
-    # Log current session state
-    logging.info(f"Current session state: question_count={session.get('question_count')}, secret_object={session.get('secret_object')}")
+    if session.get('game_id') != user_session.minigame.game_id or 'question_count' not in session:
+        session_log.info("Restoring missing Flask session data from the server-side session %s", user_session.id)
+        session['game_id'] = user_session.minigame.game_id
+        session['question_count'] = user_session.question_count
 
-    return session.get('secret_object'), session.get('question_count', 0)
+    return session['question_count']
+
+def request_hints(secret_object, previous_hints=()):
+    """Asks OpenAI for the next batch of hints for the object in a single call."""
+    chat_completion = upstream.complete(
+        "hints",
+        deadline=request_deadline(),
+        model="gpt-3.5-turbo",
+        response_format={"type": "json_object"},
+        messages=hint_batch_request(secret_object, previous_hints)
+    )
+    return parse_hints(chat_completion.choices[0].message.content, previous_hints)
+
+# Users whose hint queue is being refilled right now, so each gets at most one refill at a time
+hint_refills_in_progress = set()
+
+def queue_hint_refill(user_session):
+    """Starts a background refill of the user's hint queue once it is running low."""
+    minigame = user_session.minigame
+    if minigame.pending_hints > HINT_LOW_WATER or user_session.id in hint_refills_in_progress:
+        return
+    hint_refills_in_progress.add(user_session.id)
+    run_in_background(refill_hints, user_session.id, minigame.secret_object, list(minigame.hints))
+
+def refill_hints(user_id, secret_object, previous_hints):
+    """Generates the next batch of hints and appends it to the user's stored queue."""
+    try:
+        hints = request_hints(secret_object, previous_hints)
+
+        # Applied to the latest stored copy, since the user may have played on (or reset the game) meanwhile
+        def queue(user_session):
+            if not user_session.has_minigame:
+                return False
+            minigame = user_session.minigame
+            if minigame.secret_object != secret_object or minigame.hints != previous_hints:
+                logging.warning("Hint queue for %s changed during refill - skipping update", user_id)
+                return False
+            minigame.hints.extend(hints)
+
+        user_session = user_sessions.update(user_id, queue)
+        if user_session is not None and user_session.has_minigame:
+            logging.info("Queued %d hints for %s (%d pending)", len(hints), user_id,
+                         user_session.minigame.pending_hints)
+    except Exception as e:
+        logging.error("Error generating hints for %s: %s", user_id, e)
+    finally:
+        hint_refills_in_progress.discard(user_id)
 
 def generate_hint_for_user(user_session):
-    """Generates a hint for the secret object for a specific user."""
+    """Gives the user the next queued hint. Only a hint request that finds the queue empty waits on OpenAI."""
+    minigame = user_session.minigame
     try:
-        chat_completion = client_diva.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content":
-                    f"Generate a subtle hint about {user_session.secret_object} for a guessing game. "
-                    f"Requirements for this hint:\n"
-                    f"1. Never mention '{user_session.secret_object}' directly - always refer to it as 'this object' or 'it'.\n"
-                    f"2. Keep the hint concise - exactly one sentence.\n"
-                    f"3. Make the hint moderately challenging - it should provide a clue but not reveal the answer.\n"
-                    f"4. Focus on a less obvious characteristic - avoid the most defining feature.\n"
-                    f"5. The hint can reference function, context, material, or history - but should not make the answer immediately obvious.\n"
-                    f"6. Avoid patterns like 'This object is used for...' in every hint - vary your approach.\n\n"
-                    f"Example format: 'It's commonly found in kitchens but rarely discussed at dinner parties.'\n"
-                    f"Your hint:"
-                 }
-            ]
-        )
-        response = chat_completion.choices[0].message.content
-        user_session.game_chat_history.append({"role": "assistant", "content": response})
-        return response
+        if not minigame.pending_hints:
+            minigame.hints.extend(request_hints(minigame.secret_object, minigame.hints))
+        if not minigame.pending_hints:
+            return "Oops! Something went wrong. Try again."
+        response = minigame.next_hint()
+    except UpstreamUnavailable:
+        minigame.answer_sheet = minigame.answer_sheet or answer_sheets.get(minigame.secret_object)
+        response = local_hint(minigame.answer_sheet, object_catalog.category_of(minigame.secret_object))
     except Exception as e:
-        logging.error(f"OpenAI API error: {e}")
+        logging.error("OpenAI API error: %s", e)
         return "Oops! Something went wrong. Try again."
 
+    user_session.game_chat_history.append({"role": "assistant", "content": response})
+    return response
+
+def answer_minigame_question(minigame_state, user_prompt):
+    """Answers a yes/no question locally when possible: from the object's answer sheet, then from answers
+    anyone already got for the same object. Only other questions go to OpenAI."""
+    secret_object = minigame_state.secret_object
+    if minigame_state.answer_sheet is None:
+        minigame_state.answer_sheet = answer_sheets.get(secret_object)
+        if minigame_state.answer_sheet is None:
+            answer_sheets.prepare_in_background(secret_object)
+    if minigame_state.answer_sheet:
+        response = answer_from_sheet(minigame_state.answer_sheet, user_prompt)
+        record_lookup("answer_sheet", response is not None)
+        if response is not None:
+            return response
+
+    response = answer_cache.get(secret_object, user_prompt)
+    record_lookup("answer_cache", response is not None)
+    if response is None:
+        response = ask_minigame_question(secret_object, user_prompt)
+        answer_cache.put(secret_object, user_prompt, response)
+    return response
+
+def ask_minigame_question(secret_object, user_prompt):
+    """Asks OpenAI to answer a yes/no question about the secret object without revealing it."""
+    chat_completion = upstream.complete(
+        "minigame",
+        deadline=request_deadline(),
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": render_minigame_prompt(secret_object)},
+            {"role": "user", "content": f"Does this object relate to: {user_prompt}?"}
+        ]
+    )
+    return chat_completion.choices[0].message.content
+
 # ==================== API ENDPOINTS ====================
 @app.route("/api/chat", methods=["POST"])
 def chat():
@@ -283,10 +697,18 @@ def chat():
     user_session.diva_chat_history.append({"role": "user", "content": user_prompt})
 
     try:
-        chat_completion = client_diva.chat.completions.create(
+        chat_completion = upstream.complete(
+            "chat",
+            deadline=request_deadline(),
             model="gpt-3.5-turbo",
-            messages=user_session.diva_chat_history
+            messages=build_chat_messages(user_session, user_id)
         )
+    except UpstreamUnavailable:
+        user_session.diva_chat_history.pop()
+        return jsonify({
+            "response": NAPPING_REPLY,
+            "remaining_words": max(TOTAL_WORD_LIMIT - user_session.diva_word_count, 0)
+        })
     except Exception as e:
         logging.error("Error calling OpenAI API", exc_info=True)
         return jsonify({"error": f"OpenAI API error: {e}"}), 500
@@ -308,54 +730,129 @@ def chat():
 
     return response
 
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """Streams Diva's reply as Server-Sent Events, enforcing the word limit as tokens arrive."""
+    user_session, user_id = get_user_session()
+
+    data = request.get_json()
+    user_prompt = data.get("prompt", "")
+    if not user_prompt:
+        return jsonify({"error": "No prompt provided."}), 400
+
+    if user_session.diva_word_count >= TOTAL_WORD_LIMIT:
+        return jsonify({
+            "error": "Word limit reached. No more responses.",
+            "remaining_words": 0
+        }), 400
+
+    user_session.diva_chat_history.append({"role": "user", "content": user_prompt})
+
+    try:
+        stream = upstream.stream(
+            "chat_stream",
+            deadline=request_deadline(),
+            model="gpt-3.5-turbo",
+            messages=build_chat_messages(user_session, user_id)
+        )
+    except UpstreamUnavailable:
+        user_session.diva_chat_history.pop()
+        remaining_words = max(TOTAL_WORD_LIMIT - user_session.diva_word_count, 0)
+        return Response(
+            [sse_event({"delta": NAPPING_REPLY}),
+             sse_event({"remaining_words": remaining_words, "truncated": False}, event="done")],
+            mimetype="text/event-stream")
+    except Exception as e:
+        logging.error("Error calling OpenAI API", exc_info=True)
+        return jsonify({"error": f"OpenAI API error: {e}"}), 500
+
+    def generate():
+        word_limit = StreamingWordLimit(TOTAL_WORD_LIMIT - user_session.diva_word_count)
+        parts = []
+        try:
+            for chunk in stream:
+                record_usage("chat_stream", chunk.usage)
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                kept = word_limit.feed(delta)
+                if kept:
+                    parts.append(kept)
+                    yield sse_event({"delta": kept})
+                if word_limit.truncated:
+                    # Stop reading (and paying for) tokens we would throw away
+                    parts.append(WORD_LIMIT_SUFFIX)
+                    yield sse_event({"delta": WORD_LIMIT_SUFFIX})
+                    break
+        except Exception as e:
+            UPSTREAM_ERRORS.labels("chat_stream").inc()
+            logging.error("Error streaming from OpenAI API", exc_info=True)
+            yield sse_event({"error": f"OpenAI API error: {e}"}, event="error")
+        finally:
+            # Also runs when the client disconnects mid-stream
+            stream.close()
+            reply = {"role": "assistant", "content": "".join(parts)}
+            words_used = user_session.diva_word_count + word_limit.word_count
+
+            def add_reply(stored):
+                stored.diva_chat_history.append(reply)
+                stored.diva_word_count += word_limit.word_count
+
+            # The response (and its after_request save) went out before the stream finished, so the reply
+            # goes onto the latest stored copy rather than the one this request loaded
+            user_sessions.update(user_id, add_reply)
+
+        yield sse_event({
+            "remaining_words": max(TOTAL_WORD_LIMIT - words_used, 0),
+            "truncated": word_limit.truncated
+        }, event="done")
+
+    response = Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # don't let proxies buffer the stream
+
+    if not request.cookies.get('user_id'):
+        response.set_cookie('user_id', user_id, max_age=86400*30)  # 30 days
+
+    return response
+
 @app.route("/api/minigame", methods=["POST"])
 def minigame():
 
-    logging.info(f"Request cookies: {dict(request.cookies)}")
-    logging.info(f"Session before processing: {dict(session) if session else 'No session'}")
+    if session_log.isEnabledFor(logging.DEBUG):
+        session_log.debug("Request cookies: %s", dict(request.cookies))
+        session_log.debug("Session before processing: %s", dict(session))
     # Get session_id from query parameters if available
     client_session_id = request.args.get('client_session_id')
 
     # Track if this is a new session
     is_new_session = False
 
-    if client_session_id and client_session_id in user_sessions:
-        user_session = user_sessions[client_session_id]
+    user_session = load_user_session(client_session_id)
+    if user_session:
         user_id = client_session_id
-        logging.info(f"Using client_session_id from query params: {client_session_id}")
+        session_log.debug("Using client_session_id from query params: %s", client_session_id)
     else:
         # Otherwise use the standard get_user_session function
         user_session, user_id = get_user_session()
         # Check if this is a newly created session (user_id not in cookies)
         is_new_session = user_id != request.cookies.get('user_id')
         if is_new_session:
-            logging.info(f"New session detected with ID: {user_id}")
+            session_log.debug("New session detected with ID: %s", user_id)
 
     # Also ensure Flask session data exists
-    secret_object, question_count = ensure_session_data()
+    question_count = ensure_session_data(user_session)
 
     # Handle session data synchronization
     if is_new_session:
-        # For new sessions, always use the freshly generated object from UserSession
-        session['secret_object'] = user_session.secret_object
+        # For new sessions, always use the fresh counter from UserSession
         session['question_count'] = user_session.question_count
-        session['game_chat_history'] = user_session.game_chat_history
-        logging.info(f"New session - using UserSession object: {user_session.secret_object}")
+        session_log.debug("New session - using UserSession object: %s", user_session.secret_object)
     else:
-        # For existing sessions, sync both ways
-        if secret_object:
-            user_session.secret_object = secret_object
-        else:
-            session['secret_object'] = user_session.secret_object
+        # For existing sessions, the cookie's counter wins
+        user_session.question_count = question_count
 
-        # Sync question count
-        if 'question_count' in session:
-            user_session.question_count = session['question_count']
-        else:
-            session['question_count'] = user_session.question_count
-
-    # Log what we're working with
-    logging.info(f"Using secret_object: {secret_object} | question_count: {question_count}")
+    session_log.debug("Using secret_object: %s | question_count: %s", user_session.secret_object, question_count)
 
     data = request.get_json()
     user_prompt = data.get("prompt", "").strip().lower()
@@ -368,209 +865,45 @@ def minigame():
             "game_over": True
         })
 
-    logging.info(f"User {user_id} - Question {user_session.question_count + 1}/20: {user_prompt}")
+    session_log.debug("User %s - Question %d/20: %s", user_id, user_session.question_count + 1, user_prompt)
+
+    # Guesses ("i guess a phone", "is it a cellphone") are recognized first, so they don't have to look like questions
+    guess = guess_matcher.parse(user_prompt)
 
     # Check if input appears to be a question
-    if not is_question(user_prompt):
+    if guess is None and not is_question(user_prompt):
         return jsonify({"response": "That doesn't sound like a question! Try asking a yes/no question. 😏"})
 
     # Update counter and history for every valid question
     user_session.question_count += 1
     user_session.game_chat_history.append({"role": "user", "content": user_prompt})
 
-    # First, clean the input by removing punctuation and extra spaces
-    clean_prompt = user_prompt.lower().replace('?', '').strip()
-    guessed_object = None
-    handle_as_guess = False
-
-    # Direct guesses pattern
-    if re.match(r'^(i guess|my guess is) (.+)$', clean_prompt):
-        guessed_object = re.sub(r'^(i guess|my guess is) ', '', clean_prompt)
-        handle_as_guess = True
-        logging.info(f"Direct guess detected: '{guessed_object}'")
-
-    # Question-based guesses pattern
-    elif re.match(r'^is (it|this|that) (a |an |the |)([\w\s-]{1,20})$', clean_prompt):
-    # Extract just the object name
-        match = re.match(r'^is (it|this|that) (a |an |the |)([\w\s-]{1,20})$', clean_prompt)
-        if match:
-            guessed_object = match.group(3).strip()
-            # Only process as a guess if it's a short phrase (1-2 words)
-            if len(guessed_object.split()) <= 2:
-                handle_as_guess = True
-                logging.info(f"Object guess detected: '{guessed_object}'")
-            else:
-                # Too long to be a simple object name
-                handle_as_guess = False
-                guessed_object = None
-    elif clean_prompt.startswith("is the object "):
-        handle_as_guess = False
-    logging.info(f"Property question detected: '{clean_prompt}'")
-
-    logging.info(f"Secret object: '{user_session.secret_object.lower()}', Guessed object: '{guessed_object}', Handle as guess: {handle_as_guess}")
-
-    # Now use handle_as_guess to control the flow
-    if handle_as_guess and guessed_object and guessed_object == user_session.secret_object.lower():
-        response = f"🎉 Yes! You got it right, it's {user_session.secret_object}! You must be psychic! 😏"
-        logging.info(f"🎉 User {user_id} - Correct guess on question {user_session.question_count}: {user_session.secret_object}")
-        reset_game_for_user(user_session)
-        return jsonify({"response": response, "game_over": True, "session_id": user_id})
-    elif handle_as_guess:
-        response = "Nope, that's not it! Keep trying, detective. 😏"
-        return jsonify({"response": response, "game_over": False, "session_id": user_id})
+    if guess is not None:
+        guessed_object, direct = guess
+        session_log.debug("Secret object: %r, Guessed object: %r, Direct: %s", user_session.secret_object, guessed_object, direct)
+
+        if guess_matcher.is_correct(guessed_object, user_session.secret_object, direct):
+            response = f"🎉 Yes! You got it right, it's {user_session.secret_object}! You must be psychic! 😏"
+            logging.info("🎉 User %s - Correct guess on question %d: %s", user_id, user_session.question_count, user_session.secret_object)
+            reset_game_for_user(user_session)
+            return jsonify({"response": response, "game_over": True, "session_id": user_id})
+        # "is it heavy" is a property question; only a named object counts as a wrong guess
+        if direct or guess_matcher.names_an_object(guessed_object):
+            response = "Nope, that's not it! Keep trying, detective. 😏"
+            return jsonify({"response": response, "game_over": False, "session_id": user_id})
 
     user_session.game_chat_history.append({"role": "assistant", "content": user_prompt})
     try:
-        chat_completion = client_diva.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system",
-                 "content": f"You are a sassy AI playing 20 Questions. The secret object is '{user_session.secret_object}'. "
-                            f"The user is asking yes/no questions to guess the object. "
-                            f"Always respond with 'Yes' or 'No' and briefly explain why, **BUT NEVER mention the object's name**. "
-                            f"Instead of saying '{user_session.secret_object}', always use 'this object' or 'it'. "
-
-
-                            f"### Object Understanding Rules: "
-
-                            f"#### Physical Properties:"
-                            f"- If this object is a physical thing that can be grabbed, held, or carried (e.g., telescope, book, phone), answer 'Yes, this object can be held.' "
-                            f"- If the object is too large to be carried (e.g., car, house, mountain), answer 'No, this object is too big to be carried.' "
-                            f"- If the object is not tangible (e.g., Wi-Fi, time, an idea), answer 'No, this object cannot be physically grabbed.' "
-                            f"- If the object is big (e.g., tree, house, car, elephant, airplane), answer 'Yes, this object is large. 😏' "
-                            f"- If the object is small (e.g., coin, phone, key), answer 'Yes, this object is small and easy to carry. 😏' "
-                            f"- If the object varies in size (e.g., book, box, ball), answer 'It depends! This object comes in different sizes. 😏' "
-                            f"- If the object is made of metal (e.g., car, fork, robot), answer 'Yes, this object contains metal. 😏' "
-                            f"- If the object is not made of metal (e.g., paper, cotton, plastic toy), answer 'No, this object isn't made of metal. 😏' "
-
-                            f"#### Functional Properties:"
-                            f"- If this object is commonly used in a certain situation (e.g., an umbrella in the rain), answer 'Yes, this object is designed for that use.' "
-                            f"- If the object is not used for that purpose, answer 'No, this object is not typically used for that.' "
-                            f"- If the object has wheels (e.g., unicycle, car, bicycle), answer 'Yes, this object has wheels. 😏' "
-                            f"- If the object does not have wheels, answer 'No, this object does not have wheels. 😏' "
-                            f"- If the object is electronic (e.g., computer, smartphone, TV), answer 'Yes, this object uses electricity. 😏' "
-                            f"- If the object is not electronic (e.g., book, rock, wooden chair), answer 'No, this object doesn't use electricity. 😏' "
-                            f"- If the object is wearable (e.g., hat, shoes, jewelry), answer 'Yes, this object can be worn. 😏' "
-                            f"- If the object is not wearable (e.g., table, car, book), answer 'No, this object is not something you would wear. 😏' "
-
-                            f"#### Sensory Properties:"
-                            f"- If the object is brightly colored (e.g., traffic cone, parrot, neon sign), answer 'Yes, this object is typically bright or colorful. 😏' "
-                            f"- If the object has a strong smell (e.g., perfume, cheese, skunk), answer 'Yes, this object has a distinctive odor. 😏' "
-                            f"- If the object has a texture (e.g., sandpaper, velvet, fur), answer 'Yes, this object has a notable texture. 😏' "
-                            f"- If the object is transparent (e.g., glass, clear plastic, window), answer 'Yes, this object is see-through. 😏' "
-                            f"- If the object is reflective (e.g., mirror, polished metal, glass), answer 'Yes, this object can reflect light or images. 😏' "
-
-                            f"#### Origin & Production:"
-                            f"- If the object is natural (e.g., rock, tree, fruit), answer 'Yes, this object occurs in nature. 😏' "
-                            f"- If the object is human-made (e.g., computer, car, book), answer 'Yes, this object is manufactured by humans. 😏' "
-                            f"- If the object is handcrafted (e.g., pottery, knitted sweater, carved statue), answer 'Yes, this object can be made by hand. 😏' "
-                            f"- If the object is mass-produced (e.g., plastic bottle, smartphone, paper clip), answer 'Yes, this object is typically mass-produced. 😏' "
-
-                            f"#### Use & Purpose:"
-                            f"- If the object is used for entertainment (e.g., TV, board game, musical instrument), answer 'Yes, this object is used for entertainment. 😏' "
-                            f"- If the object is used for communication (e.g., phone, computer, paper), answer 'Yes, this object can be used for communication. 😏' "
-                            f"- If the object is decorative (e.g., painting, vase, ornament), answer 'Yes, this object is often used for decoration. 😏' "
-                            f"- If the object is a tool (e.g., hammer, scissors, screwdriver), answer 'Yes, this object is a tool. 😏' "
-                            f"- If the object is used for cooking (e.g., pot, spatula, oven), answer 'Yes, this object is used in cooking. 😏' "
-
-                            f"#### Cultural & Social Context:"
-                            f"- If the object is expensive (e.g., diamond, yacht, luxury car), answer 'Yes, this object is typically expensive. 😏' "
-                            f"- If the object is common in households (e.g., chair, toothbrush, refrigerator), answer 'Yes, this object is found in most homes. 😏' "
-                            f"- If the object is seasonal (e.g., Christmas tree, beach ball, snow shovel), answer 'Yes, this object is associated with specific seasons. 😏' "
-                            f"- If the object is culturally significant (e.g., religious symbol, national flag), answer 'Yes, this object holds cultural significance. 😏' "
-
-                            f"#### Environmental Impact:"
-                            f"- If the object is recyclable (e.g., aluminum can, glass bottle, paper), answer 'Yes, this object can be recycled. 😏' "
-                            f"- If the object is biodegradable (e.g., fruit peel, paper, wooden item), answer 'Yes, this object will naturally decompose. 😏' "
-                            f"- If the object is environmentally harmful (e.g., plastic bag, styrofoam), answer 'Yes, this object can be harmful to the environment. 😏' "
-
-                            f"#### Temporal Aspects:"
-                            f"- If the object is modern (e.g., smartphone, electric car, 3D printer), answer 'Yes, this object is a modern invention. 😏' "
-                            f"- If the object is ancient (e.g., sundial, hieroglyphics, stone tools), answer 'Yes, this object has existed for centuries. 😏' "
-                            f"- If the object is temporary (e.g., ice sculpture, sandcastle, chalk drawing), answer 'Yes, this object is not permanent. 😏' "
-                            f"- If the object changes over time (e.g., plant, candle, battery), answer 'Yes, this object changes as time passes. 😏' "
-
-                            f"#### Nature & Classification:"
-                            f"- If the object is food (e.g., banana, pizza, cupcake), answer 'Yes, this object is a type of food. 😏' "
-                            f"- If the object is not food (e.g., unicycle, book, phone), answer 'No, this object is not food. 😏' "
-                            f"- If the object is alive (e.g., dog, plant, human), answer 'Yes, this object is a living thing. 😏' "
-                            f"- If the object is not alive (e.g., chair, computer, book), answer 'No, this object is not a living thing. 😏' "
-
-                            f"#### Behavior Properties:"
-                            f"- If the object can move on its own (e.g., cat, car, robot), answer 'Yes, this object can move independently. 😏' "
-                            f"- If the object cannot move on its own (e.g., table, painting, rock), answer 'No, this object can't move by itself. 😏' "
-                            f"- If the object makes noise (e.g., dog, bell, musical instrument), answer 'Yes, this object can make sounds. 😏' "
-                            f"- If the object doesn't make noise (e.g., pillow, pencil, painting), answer 'No, this object doesn't make noise. 😏' "
-
-                            f"#### Location Properties:"
-                            f"- If the object is found indoors (e.g., sofa, fridge, bed), answer 'Yes, this object is typically found indoors. 😏' "
-                            f"- If the object is found outdoors (e.g., tree, garden hose, street sign), answer 'Yes, this object is typically found outdoors. 😏' "
-                            f"- If the object is found in both places, answer 'This object can be found both indoors and outdoors. 😏' "
-
-                            f"#### Sensory Properties:"
-                            f"- If the object is brightly colored (e.g., traffic cone, parrot, neon sign), answer 'Yes, this object is typically bright or colorful. 😏' "
-                            f"- If the object has a strong smell (e.g., perfume, cheese, skunk), answer 'Yes, this object has a distinctive odor. 😏' "
-                            f"- If the object has a texture (e.g., sandpaper, velvet, fur), answer 'Yes, this object has a notable texture. 😏' "
-                            f"- If the object is transparent (e.g., glass, clear plastic, window), answer 'Yes, this object is see-through. 😏' "
-                            f"- If the object is reflective (e.g., mirror, polished metal, glass), answer 'Yes, this object can reflect light or images. 😏' "
-
-                            f"#### Origin & Production:"
-                            f"- If the object is natural (e.g., rock, tree, fruit), answer 'Yes, this object occurs in nature. 😏' "
-                            f"- If the object is human-made (e.g., computer, car, book), answer 'Yes, this object is manufactured by humans. 😏' "
-                            f"- If the object is handcrafted (e.g., pottery, knitted sweater, carved statue), answer 'Yes, this object can be made by hand. 😏' "
-                            f"- If the object is mass-produced (e.g., plastic bottle, smartphone, paper clip), answer 'Yes, this object is typically mass-produced. 😏' "
-
-                            f"#### Use & Purpose:"
-                            f"- If the object is used for entertainment (e.g., TV, board game, musical instrument), answer 'Yes, this object is used for entertainment. 😏' "
-                            f"- If the object is used for communication (e.g., phone, computer, paper), answer 'Yes, this object can be used for communication. 😏' "
-                            f"- If the object is decorative (e.g., painting, vase, ornament), answer 'Yes, this object is often used for decoration. 😏' "
-                            f"- If the object is a tool (e.g., hammer, scissors, screwdriver), answer 'Yes, this object is a tool. 😏' "
-                            f"- If the object is used for cooking (e.g., pot, spatula, oven), answer 'Yes, this object is used in cooking. 😏' "
-
-                            f"#### Cultural & Social Context:"
-                            f"- If the object is expensive (e.g., diamond, yacht, luxury car), answer 'Yes, this object is typically expensive. 😏' "
-                            f"- If the object is common in households (e.g., chair, toothbrush, refrigerator), answer 'Yes, this object is found in most homes. 😏' "
-                            f"- If the object is seasonal (e.g., Christmas tree, beach ball, snow shovel), answer 'Yes, this object is associated with specific seasons. 😏' "
-                            f"- If the object is culturally significant (e.g., religious symbol, national flag), answer 'Yes, this object holds cultural significance. 😏' "
-
-                            f"#### Environmental Impact:"
-                            f"- If the object is recyclable (e.g., aluminum can, glass bottle, paper), answer 'Yes, this object can be recycled. 😏' "
-                            f"- If the object is biodegradable (e.g., fruit peel, paper, wooden item), answer 'Yes, this object will naturally decompose. 😏' "
-                            f"- If the object is environmentally harmful (e.g., plastic bag, styrofoam), answer 'Yes, this object can be harmful to the environment. 😏' "
-
-                            f"#### Temporal Aspects:"
-                            f"- If the object is modern (e.g., smartphone, electric car, 3D printer), answer 'Yes, this object is a modern invention. 😏' "
-                            f"- If the object is ancient (e.g., sundial, hieroglyphics, stone tools), answer 'Yes, this object has existed for centuries. 😏' "
-                            f"- If the object is temporary (e.g., ice sculpture, sandcastle, chalk drawing), answer 'Yes, this object is not permanent. 😏' "
-                            f"- If the object changes over time (e.g., plant, candle, battery), answer 'Yes, this object changes as time passes. 😏' "
-
-                            f"#### General Guidelines:"
-                            f"- Consider the object's size, function, category, shape, material, and common uses before answering. "
-                            f"- Consider its shape, material, color, and function before answering. "
-                            f"- If unsure, say 'I'm not sure, but keep guessing! 😏'. "
-                            f"- NEVER ignore valid questions or default to 'Nope, that's not it!' unless the answer is truly 'No'. "
-
-                            f"### Answer Examples: "
-                            f"- If the object is 'umbrella' and the user asks 'Is it used in the rain?', respond with 'Yes, this object can be used in the rain. 😏' "
-                            f"- If the object is 'television' and the user asks 'Can it be found in a house?', respond with 'Yes, this object is commonly found in homes. 😏' "
-                            f"- If the object is 'television' and the user asks 'Is it rectangular?', respond with 'Yes, this object is typically rectangular. 😏' "
-                            f"- If the object is 'banana' and the user asks 'Is it food?', respond with 'Yes, this object is a type of food. 😏' "
-                            f"- If the object is 'cupcake' and the user asks 'Is it sweet?', respond with 'Yes, this object is known for being sweet and delicious. 😏' "
-                            f"- If the object is 'balloon' and the user ask 'is it round', respond with 'Yes, this object is round.' "
-
-                            f"### Special Handling: "
-                            f"- If the user asks 'Is it {user_session.secret_object}?', respond with '🎉 Yes! You got it right! You must be psychic! 😏' and end the game. "
-                            f"- If the user asks a completely unrelated question (e.g., 'What's your favorite color?'), respond with 'Let's stay on topic! Ask a yes/no question. 😏' "
-                            f"- If the user asks a vague or open-ended question (e.g., 'Tell me about it'), respond with 'Ask me a yes/no question to learn more! 😏' "
-                 },
-                {"role": "user", "content": f"Does this object relate to: {user_prompt}?"}
-            ]
-        )
-        response = chat_completion.choices[0].message.content
+        response = answer_minigame_question(user_session.minigame, user_prompt)
         user_session.game_chat_history.append({"role": "assistant", "content": response})
         session['question_count'] += 1
+    except UpstreamUnavailable:
+        # Not the student's fault, so the question doesn't count
+        del user_session.game_chat_history[-2:]
+        user_session.question_count -= 1
+        return jsonify({"response": NAPPING_REPLY, "game_over": False, "session_id": user_id})
     except Exception as e:
-        logging.error(f"OpenAI API error: {e}")
+        logging.error("OpenAI API error: %s", e)
         return jsonify({"response": "Oops! Something went wrong. Try again.", "game_over": False})
 
     response_json = jsonify({
@@ -580,8 +913,9 @@ def minigame():
         "session_id": user_id
     })
 
-    logging.info(f"UserSession after processing: {user_session.secret_object}, {user_session.question_count}")
-    logging.info(f"Flask session after processing: {dict(session) if session else 'No session'}")
+    if session_log.isEnabledFor(logging.DEBUG):
+        session_log.debug("UserSession after processing: %s, %s", user_session.secret_object, user_session.question_count)
+        session_log.debug("Flask session after processing: %s", dict(session))
 
     # Set user_id cookie if not already set
     if not request.cookies.get('user_id'):
@@ -596,10 +930,10 @@ def reset():
     client_session_id = request.args.get('client_session_id')
 
     # If client_session_id is provided and exists in our sessions dictionary, use it
-    if client_session_id and client_session_id in user_sessions:
-        user_session = user_sessions[client_session_id]
+    user_session = load_user_session(client_session_id)
+    if user_session:
         user_id = client_session_id
-        logging.info(f"Using client_session_id from query params: {client_session_id}")
+        session_log.debug("Using client_session_id from query params: %s", client_session_id)
     else:
         # Otherwise use the standard get_user_session function
         user_session, user_id = get_user_session()
@@ -624,10 +958,10 @@ def hint():
     client_session_id = request.args.get('client_session_id')
 
     # If client_session_id is provided and exists in our sessions dictionary, use it
-    if client_session_id and client_session_id in user_sessions:
-        user_session = user_sessions[client_session_id]
+    user_session = load_user_session(client_session_id)
+    if user_session:
         user_id = client_session_id
-        logging.info(f"Using client_session_id from query params: {client_session_id}")
+        session_log.debug("Using client_session_id from query params: %s", client_session_id)
     else:
         # Otherwise use the standard get_user_session function
         user_session, user_id = get_user_session()
@@ -645,6 +979,64 @@ def hint():
 
     return response
 
+# ==================== CLASSROOMS ====================
+def warm_classroom_session(user_id, secret_object):
+    """Builds a provisioned session's answer sheet and first hints, and stores both in the session."""
+    answer_sheets.prepare(secret_object)
+    sheet = answer_sheets.get(secret_object)
+
+    def store_sheet(user_session):
+        if not user_session.has_minigame or user_session.secret_object != secret_object:
+            return False
+        if sheet is not None and user_session.minigame.answer_sheet is None:
+            # Stored with the session, so whichever worker the student lands on can answer from it
+            user_session.minigame.answer_sheet = sheet
+        else:
+            return False
+
+    user_session = user_sessions.update(user_id, store_sheet)
+    if user_session is None or not user_session.has_minigame or user_session.secret_object != secret_object:
+        hint_refills_in_progress.discard(user_id)
+        return
+    refill_hints(user_id, secret_object, [])
+
+@app.route("/api/classroom", methods=["POST"])
+def provision_classroom():
+    """Creates sessions for a classroom ahead of time, one distinct secret object each.
+
+    Expects {"classroom": "<code>", "students": N} and an "Authorization: Bearer <DIVA_INSTRUCTOR_TOKEN>" header.
+    Returns the session ids, to be handed out as client_session_id. Answer sheets and hints are built in the
+    background, so the students' first requests don't wait on OpenAI.
+    """
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not INSTRUCTOR_TOKEN or not hmac.compare_digest(token, INSTRUCTOR_TOKEN):
+        return jsonify({"error": "Instructor token required."}), 403
+
+    data = request.get_json(silent=True) or {}
+    classroom = str(data.get("classroom", "")).strip()
+    try:
+        students = int(data.get("students", 0))
+    except (TypeError, ValueError):
+        students = 0
+    if not classroom or not 1 <= students <= MAX_CLASSROOM_SIZE:
+        return jsonify({"error": f"Provide a classroom code and between 1 and {MAX_CLASSROOM_SIZE} students."}), 400
+
+    # Drawn in the classroom's own scope, so a class that comes back gets objects it hasn't seen
+    secret_objects = object_catalog.draw_many(students, SECRET_OBJECT_CATEGORY, SECRET_OBJECT_DIFFICULTY,
+                                              scope=f"classroom:{classroom}")
+    session_ids = []
+    for secret_object in secret_objects:
+        user_session = UserSession()
+        user_session.secret_object = secret_object
+        user_sessions[user_session.id] = user_session
+        guess_matcher.alias_index(secret_object)
+        hint_refills_in_progress.add(user_session.id)
+        run_in_background(warm_classroom_session, user_session.id, secret_object)
+        session_ids.append(user_session.id)
+
+    logging.info("Provisioned %d sessions for classroom %s", students, classroom)
+    return jsonify({"classroom": classroom, "session_ids": session_ids})
+
 # ==================== SESSION MANAGEMENT ====================
 @app.route("/api/clear_session", methods=["POST"])
 def clear_session():
@@ -654,9 +1046,23 @@ def clear_session():
         del user_sessions[user_id]
     return jsonify({"message": "Session cleared"})
 
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Prometheus metrics, aggregated over every gunicorn worker."""
+    active_sessions.set(len(user_sessions))
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+@app.route("/api/session_stats", methods=["GET"])
+def session_stats():
+    """Reports resident sessions, their approximate size and eviction counters for this worker."""
+    return jsonify({**user_sessions.stats(), "answer_cache": answer_cache.stats(),
+                    "log_records_dropped": dropped_records()})
+
 # ==================== SESSION CLEANUP ====================
-# Optional: Add a background task to periodically clean up old sessions
-# This would require additional libraries like APScheduler
+# Idle sessions are dropped after SESSION_TTL and the oldest ones go first when MAX_SESSIONS or
+# MAX_SESSION_BYTES is exceeded. A background thread sweeps every SESSION_CLEANUP_INTERVAL seconds.
+user_sessions.start_cleanup(SESSION_CLEANUP_INTERVAL)
 
 # ==================== RUN THE APP ====================
 if __name__ == '__main__':
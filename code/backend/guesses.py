@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import re
+import sys
+from functools import lru_cache
+
+GUESS_INDEX_CACHE_SIZE = int(os.environ.get("DIVA_GUESS_INDEX_CACHE_SIZE", 2000))
+
+# "i guess a phone", "my guess is phones" are always guesses; "is it a phone" only when it names an object
+DIRECT_GUESS = re.compile(r"^(?:i guess|my guess is|i think it'?s|is it maybe) (.+)$")
+QUESTION_GUESS = re.compile(r"^(?:is|it's|its) (?:it|this|that|the object|the secret object)? ?(.+)$")
+ARTICLE = re.compile(r"^(?:a|an|the|some|your|my) ")
+PUNCTUATION = re.compile(r"[^\w\s'-]")
+MAX_GUESS_WORDS = 3
+# Everyday words students ask about; check_catalog makes sure none of them wins as a typo of an object
+ORDINARY_WORDS = ("plant", "house", "animal", "food", "fruit", "toy", "tool", "game", "machine", "vehicle",
+                  "container", "furniture", "instrument", "weapon", "drink", "liquid", "metal", "stone", "plastic",
+                  "paper", "glass", "wood", "kitchen", "clothing", "shoe", "sport", "pet", "bird", "fish", "tree")
+
+
+def singular(word):
+    """Crude singular form of an English noun, applied the same way to guesses and object names."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith(("ches", "shes", "xes", "sses", "zes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def normalize(phrase):
+    """Lowercase, no punctuation or leading article, hyphens as spaces and the last word singular."""
+    text = " ".join(PUNCTUATION.sub(" ", phrase.lower().replace("-", " ")).split())
+    text = ARTICLE.sub("", text)
+    words = text.split()
+    if not words:
+        return ""
+    words[-1] = singular(words[-1])
+    return " ".join(words)
+
+
+def forms(phrase):
+    """The normalized phrase and its spelling without spaces ("cell phone" -> "cellphone")."""
+    text = normalize(phrase)
+    return {text, text.replace(" ", "")} if text else set()
+
+
+def within_edits(a, b, limit):
+    """True if a and b are at most limit edits apart (insert, delete, substitute or swap two neighbours)."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+
+def typo_limit(text):
+    return 0 if len(text) <= 4 else 1 if len(text) <= 6 else 2
+
+
+class GuessMatcher:
+    """Recognizes guesses and checks them against the secret object without calling the model.
+
+    entries are the catalog entries; their names and aliases are the vocabulary that tells a guess
+    ("is it a phone") from a property question ("is it heavy").
+    """
+
+    def __init__(self, entries):
+        self._aliases = {entry["name"].lower(): tuple(entry.get("aliases", ())) for entry in entries}
+        self._vocabulary = set()
+        self._spellings = []  # (accepted spelling, catalog name)
+        for entry in entries:
+            for name in (entry["name"], *entry.get("aliases", ())):
+                self._vocabulary |= forms(name)
+                self._spellings.extend((form, entry["name"].lower()) for form in forms(name))
+        self.alias_index = lru_cache(maxsize=GUESS_INDEX_CACHE_SIZE)(self._build_alias_index)
+
+    def _build_alias_index(self, secret_object):
+        """Every accepted spelling of the object: its name and aliases, singular and without spaces."""
+        index = set()
+        for name in (secret_object, *self._aliases.get(secret_object.lower(), ())):
+            index |= forms(name)
+        return frozenset(index)
+
+    def parse(self, text):
+        """Returns (guess, direct) for "i guess X" (direct) or "is it X" (not direct), or None."""
+        text = " ".join(PUNCTUATION.sub(" ", text.lower()).split())
+        match = DIRECT_GUESS.match(text)
+        if match:
+            return match.group(1), True
+        match = QUESTION_GUESS.match(text)
+        if match and len(ARTICLE.sub("", match.group(1)).split()) <= MAX_GUESS_WORDS:
+            return match.group(1), False
+        return None
+
+    def is_correct(self, guess, secret_object, direct=False):
+        """Exact match on any accepted spelling. Typos are only forgiven in direct guesses ("i guess telescpoe"):
+        "is it a plant" is a question about plants, not a misspelled "plane". Even then the secret must be
+        the closest catalog object, so "i guess plane" never matches "plate"."""
+        index = self.alias_index(secret_object)
+        if forms(guess) & index:
+            return True
+        if not direct:
+            return False
+        if self.names_an_object(guess):
+            return False
+        return self.closest_objects(normalize(guess)) == {secret_object.lower()}
+
+    def closest_objects(self, text):
+        """Catalog names with a spelling the fewest edits from text, within each spelling's typo limit."""
+        for limit in range(typo_limit(text) + 2):
+            names = {name for form, name in self._spellings
+                     if limit <= typo_limit(form) and within_edits(text, form, limit)}
+            if names:
+                return names
+        return set()
+
+    def names_an_object(self, guess):
+        """True if the guess is a known object name, rather than a property like "heavy" or "used outside"."""
+        return bool(forms(guess) & self._vocabulary)
+
+
+def check_catalog(entries):
+    """Guesses the catalog gets wrong: (secret, guess) pairs where naming one object counts as guessing
+    another, an object's own name or alias is not accepted, or a question about an ordinary word wins."""
+    matcher = GuessMatcher(entries)
+    wrong = []
+    for secret in entries:
+        own = {secret["name"], *secret.get("aliases", ())}
+        for word in ORDINARY_WORDS:
+            guess = f"a {word}"
+            if matcher.is_correct(guess, secret["name"]) != bool(forms(word) & matcher.alias_index(secret["name"])):
+                wrong.append((secret["name"], guess))
+        for entry in entries:
+            for name in (entry["name"], *entry.get("aliases", ())):
+                expected = name in own or bool(forms(name) & matcher.alias_index(secret["name"]))
+                for guess, direct in ((name, True), (f"a {name}", False)):
+                    if matcher.is_correct(guess, secret["name"], direct) != expected:
+                        wrong.append((secret["name"], guess))
+    return wrong
+
+
+def main():
+    from backend.catalog import CATALOG_PATH
+
+    parser = argparse.ArgumentParser(description="Check every pair of catalog objects against the guess matcher.")
+    parser.add_argument("--path", default=CATALOG_PATH)
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        entries = json.load(f)
+    wrong = check_catalog(entries)
+    for secret, guess in wrong:
+        print(f"{guess!r} is judged wrongly for {secret!r}")
+    print(f"{len(entries) ** 2} pairs checked, {len(wrong)} wrong")
+    sys.exit(1 if wrong else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import json
+import os
+import random
+
+from backend.answer_sheet import CATEGORIES
+from backend.prompts import render_hint_prompt
+
+# Hints generated per upstream call, and how few may be left queued before a refill is started
+HINT_BATCH_SIZE = int(os.environ.get("DIVA_HINT_BATCH_SIZE", 5))
+HINT_LOW_WATER = int(os.environ.get("DIVA_HINT_LOW_WATER", 1))
+
+
+def hint_batch_request(secret_object, previous_hints=(), count=HINT_BATCH_SIZE):
+    """Messages asking the model for a batch of hints, continuing after any hints already generated."""
+    messages = [{"role": "system", "content": render_hint_prompt(secret_object, count)}]
+    if previous_hints:
+        given = "\n".join(f"- {hint}" for hint in previous_hints)
+        messages.append({"role": "user", "content":
+            f"These hints were already given, in order:\n{given}\n"
+            f"Continue from there: do not repeat them, and give a little more away than the last one."})
+    return messages
+
+
+def parse_hints(content, previous_hints=()):
+    """Keeps the non-empty, new hints from the model's JSON, in order."""
+    data = json.loads(content)
+    seen = {hint.lower() for hint in previous_hints}
+    hints = []
+    for hint in data.get("hints", []):
+        hint = str(hint).strip()
+        if hint and hint.lower() not in seen:
+            seen.add(hint.lower())
+            hints.append(hint)
+    return hints
+
+
+def local_hint(sheet, category=None):
+    """A canned hint built without the model: a random "yes" property from the answer sheet, or the catalog category."""
+    facts = [description for key, description, _, _, _ in CATEGORIES if (sheet or {}).get(key) == "yes"]
+    if facts:
+        return f"Diva is napping, so here's a quick one: this object {random.choice(facts)}. 😏"
+    if category:
+        return f"Diva is napping, so here's a quick one: it's in the '{category}' category. 😏"
+    return "Diva is napping, so here's a quick one: think about where you'd find it at home or at school. 😏"
@@ -0,0 +1,116 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.environ.get("DIVA_LOG_LEVEL", "INFO").upper()
+# "json" writes one JSON object per line; "text" is the plain format for local development
+LOG_FORMAT = os.environ.get("DIVA_LOG_FORMAT", "json")
+# Records waiting for the writer thread; when it is full new records are dropped rather than blocking a request
+LOG_QUEUE_SIZE = int(os.environ.get("DIVA_LOG_QUEUE_SIZE", 10000))
+# Share of requests that get an access-log line, overall and per endpoint ("minigame=0.1,chat=0.1")
+LOG_SAMPLE_RATE = float(os.environ.get("DIVA_LOG_SAMPLE_RATE", 1.0))
+LOG_SAMPLE_RATES = {
+    endpoint.strip(): float(rate)
+    for endpoint, _, rate in (item.partition("=") for item in os.environ.get("DIVA_LOG_SAMPLE_RATES", "").split(","))
+    if endpoint.strip()
+}
+# Dumps of request headers, cookies and sessions; never on in production
+DEBUG_SESSIONS = os.environ.get("DIVA_DEBUG_SESSIONS", "").lower() in ("1", "true", "yes")
+
+request_log = logging.getLogger("diva.requests")
+session_log = logging.getLogger("diva.sessions")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with any fields passed as extra={"fields": {...}}."""
+
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                 "msg": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class LazyQueueHandler(QueueHandler):
+    """Hands records to the writer thread untouched, so messages are only formatted there, and never blocks."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+_listener_args = None
+
+
+def setup_logging():
+    """Routes every log record through a bounded queue to a single writer thread."""
+    global _listener_args
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else TextFormatter()
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    root = logging.getLogger()
+    root.handlers[:] = [LazyQueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+    session_log.setLevel(logging.DEBUG if DEBUG_SESSIONS else logging.INFO)
+
+    _listener_args = (log_queue, stream_handler)
+    _start_listener()
+    atexit.register(_stop_listener)
+    # The writer thread doesn't survive a fork, so a forked worker starts its own
+    os.register_at_fork(after_in_child=_start_listener)
+
+
+def _start_listener():
+    """Starts a new writer thread on the queue. _listener is only ever a started listener."""
+    global _listener
+    _listener = QueueListener(*_listener_args, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def sampled(endpoint):
+    """Whether this request to endpoint gets an access-log line."""
+    rate = LOG_SAMPLE_RATES.get(endpoint, LOG_SAMPLE_RATE)
+    return rate >= 1 or random.random() < rate
+
+
+def dropped_records():
+    handler = logging.getLogger().handlers[0] if logging.getLogger().handlers else None
+    return getattr(handler, "dropped", 0)
@@ -0,0 +1,69 @@
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Under gunicorn every worker writes its samples to files in PROMETHEUS_MULTIPROC_DIR (set up in gunicorn.conf.py)
+# and /api/metrics merges them, so any worker can answer a scrape for all of them.
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# Only these routes get their own label; anything else is reported as "other"
+TIMED_ROUTES = frozenset({"chat", "chat_stream", "minigame", "hint", "reset"})
+
+REQUEST_SECONDS = Histogram(
+    "diva_request_seconds", "Time to build the response, per route", ["route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+UPSTREAM_SECONDS = Histogram(
+    "diva_upstream_seconds", "Upstream completion latency, per call site", ["call_site"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 30, 60),
+)
+UPSTREAM_ERRORS = Counter("diva_upstream_errors", "Failed upstream completions, per call site", ["call_site"])
+UPSTREAM_SHORT_CIRCUITS = Counter(
+    "diva_upstream_short_circuits", "Calls refused by the open circuit breaker, per call site", ["call_site"]
+)
+UPSTREAM_COALESCED = Counter(
+    "diva_upstream_coalesced", "Completions served by an identical call already in flight (calls saved), per call site",
+    ["call_site"]
+)
+BREAKER_OPEN = Gauge("diva_upstream_breaker_open", "1 while a worker's circuit breaker is open",
+                     multiprocess_mode="livemax")
+UPSTREAM_TOKENS = Counter("diva_upstream_tokens", "Tokens reported in completion.usage", ["call_site", "kind"])
+IS_QUESTION_SECONDS = Histogram(
+    "diva_is_question_seconds", "Time spent deciding whether minigame input is a question",
+    buckets=(0.00001, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+CACHE_LOOKUPS = Counter("diva_cache_lookups", "Cache lookups by cache and result (hit or miss)", ["cache", "result"])
+
+
+def route_label(endpoint):
+    return endpoint if endpoint in TIMED_ROUTES else "other"
+
+
+def record_usage(call_site, usage):
+    """Adds a completion's token usage (if the provider reported it) to the counters."""
+    if usage is None:
+        return
+    UPSTREAM_TOKENS.labels(call_site, "prompt").inc(usage.prompt_tokens or 0)
+    UPSTREAM_TOKENS.labels(call_site, "completion").inc(usage.completion_tokens or 0)
+
+
+def record_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def sessions_gauge(shared):
+    """Active sessions. Per-worker stores add up across workers; for a shared (SQLite) store the latest
+    count any worker took is the total."""
+    return Gauge("diva_active_sessions", "Sessions in the session store",
+                 multiprocess_mode="livemostrecent" if shared else "livesum")
+
+
+def render():
+    """The metrics of every worker in Prometheus text format. Returns (body, content_type)."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -6,18 +6,14 @@ from pyexpat.errors import messages
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from openai import OpenAI
 import re
-import spacy
-import spacy.cli
-import nltk
-from nltk.tokenize import word_tokenize
 
-spacy.cli.download("en_core_web_sm")
+from backend.nlp import PARSER_ONLY_EXCLUDE, load_spacy_model
+from backend.upstream import create_client
 
-# Load NLP models
-nlp = spacy.load("en_core_web_sm")
-nltk.download("punkt")
+# Load NLP models (installed from requirements.txt, never downloaded at startup). is_question only reads
+# the dependency parse, so the other pipes are left out as in diva.py.
+nlp = load_spacy_model(exclude=PARSER_ONLY_EXCLUDE)
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
@@ -26,7 +22,7 @@ logging.basicConfig(level=logging.INFO)
 
 # Initialize OpenAI client (Replace with your API key securely)
 load_dotenv()
-client = OpenAI(api_key=os.getenv("MINIGAME_API_KEY"))
+client = create_client(api_key=os.getenv("MINIGAME_API_KEY"))
 
 # System message for Ai Diva's personality
 system_message = """
@@ -51,7 +47,7 @@ def reset_game():
 
     # Print the new secret object for debugging
     print(f"DEBUG: New secret object chosen -> {secret_object}")
-    logging.info(f"New secret object chosen: {secret_object}")
+    logging.info("New secret object chosen: %s", secret_object)
 
 
 def generate_secret_object():
@@ -77,9 +73,9 @@ def generate_secret_object():
                     object_choice.split()) <= 3:
                 return object_choice
             else:
-                logging.warning(f"Invalid object generated: {object_choice}. Retrying...")
+                logging.warning("Invalid object generated: %s. Retrying...", object_choice)
         except Exception as e:
-            logging.error(f"Error generating object: {e}")
+            logging.error("Error generating object: %s", e)
             return random.choice(["cat", "pizza", "phone", "tree", "Superman"])  # Fallback option
 
 
@@ -102,7 +98,7 @@ def generate_hint():
         chat_history.append({"role": "assistant", "content": response})
 
     except Exception as e:
-        logging.error(f"OpenAI API error: {e}")
+        logging.error("OpenAI API error: %s", e)
         return jsonify({"response": "Oops! Something went wrong. Try again.", "game_over": False})
 
     return jsonify({
@@ -152,7 +148,7 @@ def minigame():
             {"response": "You've used all 20 questions! Now, guess what I'm thinking of.", "game_over": True})
 
     # Log the question count in the terminal
-    logging.info(f"Question {question_count + 1}/20: {user_prompt}")
+    logging.info("Question %d/20: %s", question_count + 1, user_prompt)
 
     #Checks if the user input is a question
     if not is_question(user_prompt):
@@ -164,7 +160,7 @@ def minigame():
     # Check if the secret object is inside the user's input
     if secret_object.lower() in guessed_object:
         response = f"🎉 Yes! You got it right, it's {secret_object}! You must be psychic! 😏"
-        logging.info(f"🎉 Correct guess on question {question_count + 1}: {secret_object}")
+        logging.info("🎉 Correct guess on question %d: %s", question_count + 1, secret_object)
 
         # Reset game BEFORE returning the response
         reset_game()
@@ -231,7 +227,7 @@ def minigame():
         chat_history.append({"role": "assistant", "content": response})
 
     except Exception as e:
-        logging.error(f"OpenAI API error: {e}")
+        logging.error("OpenAI API error: %s", e)
         return jsonify({"response": "Oops! Something went wrong. Try again.", "game_over": False})
 
     return jsonify({
@@ -0,0 +1,225 @@
+"""Deterministic local stand-in for the chat completions API, for load tests, profiling and benchmarks.
+
+Replies are canned per kind of request and picked by a hash of it, so the same request always gets the same
+answer: "Yes"/"No" for minigame questions, JSON answer sheets and hint batches, a short summary and an echoing
+Diva reply. Latency is drawn from a lognormal distribution around DIVA_MOCK_LATENCY, and a share of calls
+fail (DIVA_MOCK_ERROR_RATE) or stall (DIVA_MOCK_STALL_RATE), from a seeded generator.
+
+In-process, with no sockets: DIVA_LLM_PROVIDER=mock. As a local HTTP server that any OpenAI client can
+reach through DIVA_API_BASE_URL:
+
+    python -m backend.mock_llm --port 8011 --latency 0.8
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from backend.chat_context import estimate_tokens
+
+# Median seconds per call, and the spread of the lognormal around it (0 means every call takes the median)
+MOCK_LATENCY = float(os.environ.get("DIVA_MOCK_LATENCY", 0.8))
+MOCK_LATENCY_SIGMA = float(os.environ.get("DIVA_MOCK_LATENCY_SIGMA", 0))
+# Share of calls answered with MOCK_ERROR_STATUS (429 for rate limiting, 5xx for an outage)
+MOCK_ERROR_RATE = float(os.environ.get("DIVA_MOCK_ERROR_RATE", 0))
+MOCK_ERROR_STATUS = int(os.environ.get("DIVA_MOCK_ERROR_STATUS", 503))
+# Share of calls that hang for MOCK_STALL seconds, like an upstream that stopped responding
+MOCK_STALL_RATE = float(os.environ.get("DIVA_MOCK_STALL_RATE", 0))
+MOCK_STALL = float(os.environ.get("DIVA_MOCK_STALL", 30))
+MOCK_SEED = os.environ.get("DIVA_MOCK_SEED")
+
+# Base URL the in-process client is given; nothing listens there
+MOCK_BASE_URL = "http://mock-llm.local/v1"
+
+PROPERTY_LINE = re.compile(r"^- (\w+): ", re.MULTILINE)
+HINT_COUNT = re.compile(r"Generate (\d+) subtle hints")
+ASPECTS = ["where it is usually found", "what it is made of", "who uses it", "when it is used", "its shape",
+           "its size", "how old the idea of it is", "what it is used for"]
+
+
+def digest(*parts):
+    return int.from_bytes(hashlib.sha256("\x00".join(parts).encode()).digest()[:8], "big")
+
+
+def reply_for(messages, json_mode=False):
+    """The canned reply to a request. Only depends on the messages, never on earlier calls."""
+    system = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    user = next((message["content"] for message in reversed(messages) if message["role"] == "user"), "")
+
+    if json_mode:
+        if "answer sheets" in system:
+            return json.dumps({key: ("yes", "no")[digest(user, key) % 2] for key in PROPERTY_LINE.findall(system)})
+        if '"hints"' in system:
+            match = HINT_COUNT.search(system)
+            count = int(match.group(1)) if match else 5
+            # Continue the numbering after hints already given, so a refill never repeats one
+            given = user.count("\n- ")
+            return json.dumps({"hints": [
+                f"Hint {n}: think about {ASPECTS[digest(system, str(n)) % len(ASPECTS)]}."
+                for n in range(given + 1, given + count + 1)
+            ]})
+        if '"objects"' in system:
+            return json.dumps({"objects": []})
+        return "{}"
+    if user.startswith("Does this object relate to:"):
+        return ("No, not this object. 😏", "Yes, it does! 😏")[digest(system, user) % 2]
+    if user.startswith("Current summary:"):
+        return "The student and Ai Diva have been chatting. " + " ".join(user.split()[-20:])
+    return f"Mock Diva here, darling! You said: {user[:200]}"
+
+
+class MockLLM:
+    """Answers chat completion requests with canned replies after a simulated delay.
+
+    Serve it in-process through transport() or over HTTP through serve(). stats counts the requests,
+    errors and stalls (and, over HTTP, the connections opened).
+    """
+
+    def __init__(self, latency=MOCK_LATENCY, latency_sigma=MOCK_LATENCY_SIGMA, error_rate=MOCK_ERROR_RATE,
+                 error_status=MOCK_ERROR_STATUS, stall_rate=MOCK_STALL_RATE, stall=MOCK_STALL, seed=MOCK_SEED):
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.stats = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def draw(self):
+        """(delay in seconds, whether the call fails) for the next call."""
+        with self._lock:
+            if self._random.random() < self.stall_rate:
+                self.stats["stalls"] = self.stats.get("stalls", 0) + 1
+                return self.stall, False
+            fails = self._random.random() < self.error_rate
+            delay = self.latency
+            if self.latency_sigma:
+                delay *= math.exp(self._random.gauss(0, self.latency_sigma))
+            return delay, fails
+
+    def respond(self, request, fails=False):
+        """(status, content type, body) answering a decoded chat completions request."""
+        self.count("requests")
+        if fails:
+            self.count("errors")
+            error = {"error": {"message": "Mock upstream error", "type": "server_error", "code": self.error_status}}
+            return self.error_status, "application/json", json.dumps(error).encode()
+
+        messages = request.get("messages", [])
+        json_mode = (request.get("response_format") or {}).get("type") == "json_object"
+        content = reply_for(messages, json_mode)
+        usage = {"prompt_tokens": sum(estimate_tokens(message["content"]) for message in messages),
+                 "completion_tokens": estimate_tokens(content)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        model = request.get("model", "gpt-3.5-turbo")
+        created = int(time.time())
+
+        if not request.get("stream"):
+            return 200, "application/json", json.dumps({
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            }).encode()
+
+        def chunk(delta, finish_reason=None, usage=None):
+            choices = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            return "data: " + json.dumps({"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                                          "model": model, "choices": choices, "usage": usage}) + "\n\n"
+
+        events = [chunk({"role": "assistant", "content": ""})]
+        events.extend(chunk({"content": word}) for word in re.findall(r"\S+\s*", content))
+        events.append(chunk({}, finish_reason="stop"))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append(chunk(None, usage=usage))
+        events.append("data: [DONE]\n\n")
+        return 200, "text/event-stream", "".join(events).encode()
+
+    def transport(self):
+        """An httpx transport that answers in-process. A stall longer than the call's read timeout ends in a
+        ReadTimeout once the timeout has passed, as it would over the network."""
+        def handle(request):
+            delay, fails = self.draw()
+            read_timeout = request.extensions.get("timeout", {}).get("read")
+            if read_timeout is not None and delay > read_timeout:
+                time.sleep(read_timeout)
+                raise httpx.ReadTimeout("Mock upstream stalled", request=request)
+            time.sleep(delay)
+            status, content_type, body = self.respond(json.loads(request.content or b"{}"), fails)
+            return httpx.Response(status, headers={"Content-Type": content_type}, content=body)
+
+        return httpx.MockTransport(handle)
+
+    def handler(self):
+        mock = self
+
+        class MockLLMHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def setup(self):
+                super().setup()
+                mock.count("connections")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                delay, fails = mock.draw()
+                time.sleep(delay)
+                status, content_type, payload = mock.respond(json.loads(body or b"{}"), fails)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return MockLLMHandler
+
+    def serve(self, port=0):
+        """Starts the HTTP stand-in in a background thread. Its base URL is http://127.0.0.1:<port>/v1, and
+        server.stats is this mock's stats."""
+        server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        server.stats = self.stats
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency", type=float, default=MOCK_LATENCY)
+    parser.add_argument("--latency-sigma", type=float, default=MOCK_LATENCY_SIGMA)
+    parser.add_argument("--error-rate", type=float, default=MOCK_ERROR_RATE)
+    parser.add_argument("--error-status", type=int, default=MOCK_ERROR_STATUS)
+    parser.add_argument("--stall-rate", type=float, default=MOCK_STALL_RATE)
+    parser.add_argument("--stall", type=float, default=MOCK_STALL)
+    parser.add_argument("--seed", default=MOCK_SEED)
+    args = parser.parse_args()
+    mock = MockLLM(args.latency, args.latency_sigma, args.error_rate, args.error_status, args.stall_rate,
+                   args.stall, args.seed)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), mock.handler())
+    print(f"Mock LLM on http://127.0.0.1:{args.port}/v1 ({args.latency}s median per call)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import functools
+import logging
+import os
+import re
+
+import spacy
+
+SPACY_MODEL = os.environ.get("DIVA_SPACY_MODEL", "en_core_web_sm")
+
+
+def load_spacy_model(name=SPACY_MODEL, **kwargs):
+    """Loads a locally installed spaCy model. Never downloads; fails fast if it is missing."""
+    if not (spacy.util.is_package(name) or os.path.isdir(name)):
+        raise RuntimeError(
+            f"spaCy model '{name}' is not installed. Install it at build time with "
+            f"'pip install -r requirements.txt' (or 'python -m spacy download {name}') and restart."
+        )
+    model = spacy.load(name, **kwargs)
+    logging.info("Loaded spaCy model %s with pipes: %s", name, model.pipe_names)
+    return model
+
+
+# ==================== QUESTION DETECTION ====================
+QUESTION_WORDS = frozenset({"who", "what", "when", "where", "why", "how", "is", "does", "do", "can", "could", "would",
+                            "should", "will", "are", "was", "were"})
+
+# Words spaCy can label "aux". A sentence with none of them can never pass the parser check.
+AUXILIARY_WORDS = frozenset({"am", "is", "are", "was", "were", "be", "been", "being", "do", "does", "did",
+                             "have", "has", "had", "can", "could", "may", "might", "must", "shall", "should",
+                             "will", "would", "ought", "to", "ca", "wo", "sha", "gon", "got", "need", "dare"})
+
+# Components the question check never reads; the parser only needs tok2vec
+PARSER_ONLY_EXCLUDE = ["tagger", "attribute_ruler", "lemmatizer", "ner", "senter"]
+
+MAX_QUESTION_CHARS = int(os.environ.get("DIVA_MAX_QUESTION_CHARS", 200))
+QUESTION_CACHE_SIZE = int(os.environ.get("DIVA_QUESTION_CACHE_SIZE", 4096))
+
+# First word the way spaCy splits it ("don't" -> "do", "isn't" -> "is")
+FIRST_WORD = re.compile(r"^[^a-z]*([a-z]+?(?=n't)|[a-z]+)")
+WORD = re.compile(r"[a-z]+")
+
+
+class QuestionDetector:
+    """Tiered yes/no question detector: cheap lexical checks first, spaCy's parser only as a fallback."""
+
+    def __init__(self, model, max_chars=MAX_QUESTION_CHARS, cache_size=QUESTION_CACHE_SIZE):
+        self.model = model
+        self.max_chars = max_chars
+        self._detect_cached = functools.lru_cache(maxsize=cache_size)(self._detect)
+
+    def __call__(self, user_input):
+        text = " ".join(user_input.lower().split())
+        if not text:
+            return False
+        if text.endswith("?"):
+            return True
+        # Cap the input before it reaches the memo or the parser
+        return self._detect_cached(text[:self.max_chars])
+
+    def cache_info(self):
+        return self._detect_cached.cache_info()
+
+    def _detect(self, text):
+        first_word = FIRST_WORD.match(text)
+        if first_word and first_word.group(1) in QUESTION_WORDS:
+            return True
+        if "'" not in text and AUXILIARY_WORDS.isdisjoint(WORD.findall(text)):
+            return False
+        doc = self.model(text)
+        return any(token.dep_ == "aux" and token.head.dep_ == "ROOT" for token in doc)
@@ -0,0 +1,68 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+
+class SecretObjectPool:
+    """Bounded pool of ready secret objects that a background thread keeps topped up."""
+
+    def __init__(self, generator, fallback, size=8, low_water=None, retry_delay=5.0, prepare=None):
+        # generator() returns a new object or None on failure; fallback() must always succeed.
+        # prepare(object), if given, runs on the refill thread before an object is pooled.
+        self.generator = generator
+        self.fallback = fallback
+        self.prepare = prepare
+        self.size = size
+        self.low_water = size // 2 if low_water is None else low_water
+        self.retry_delay = retry_delay
+        self._objects = deque(maxlen=size)
+        self._wanted = threading.Event()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+    def __len__(self):
+        return len(self._objects)
+
+    def start(self):
+        """Start the refill thread (once per process, so it survives a gunicorn fork)."""
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._refill_forever, name="secret-object-pool", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+        self._wanted.set()
+
+    def pop(self):
+        """Take a ready object in O(1); only calls upstream when the pool is empty."""
+        self.start()
+        try:
+            secret_object = self._objects.popleft()
+        except IndexError:
+            secret_object = None
+
+        if len(self._objects) <= self.low_water:
+            self._wanted.set()
+
+        if secret_object is None:
+            logging.warning("Secret object pool is empty - generating on the request path")
+            secret_object = self.generator() or self.fallback()
+        return secret_object
+
+    def _refill_forever(self):
+        while True:
+            self._wanted.wait()
+            self._wanted.clear()
+            while len(self._objects) < self.size:
+                secret_object = self.generator()
+                if secret_object is None:
+                    logging.warning("Secret object pool refill failed, retrying in %ss", self.retry_delay)
+                    time.sleep(self.retry_delay)
+                    self._wanted.set()
+                    break
+                if self.prepare is not None:
+                    self.prepare(secret_object)
+                self._objects.append(secret_object)
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from backend.sqlite_pool import SQLitePool
+
+
+class MemoryRecentObjects:
+    """Recently drawn secret objects per scope, in this process only.
+
+    Each scope (a deployment or a classroom) keeps at most window objects, none older than ttl seconds.
+    """
+
+    def __init__(self, window, ttl=None):
+        self.window = window
+        self.ttl = ttl
+        self._scopes = {}  # scope -> OrderedDict(name -> used_at), oldest first
+        self._lock = threading.Lock()
+
+    def is_recent(self, scope, name):
+        with self._lock:
+            used_at = self._scopes.get(scope, {}).get(name)
+        return used_at is not None and (self.ttl is None or used_at >= time.time() - self.ttl)
+
+    def add(self, scope, name):
+        with self._lock:
+            recent = self._scopes.setdefault(scope, OrderedDict())
+            recent[name] = time.time()
+            recent.move_to_end(name)
+            while len(recent) > self.window:
+                recent.popitem(last=False)
+
+    def __len__(self):
+        return sum(len(recent) for recent in self._scopes.values())
+
+
+class SQLiteRecentObjects:
+    """Recently drawn secret objects per scope in a SQLite file that every worker shares and that survives restarts.
+
+    Lookups are a primary-key probe that ignores rows older than ttl. add() trims the scope back to window
+    objects and deletes expired rows, so the table stays bounded.
+    """
+
+    def __init__(self, path, window, ttl=None):
+        self.path = path
+        self.window = window
+        self.ttl = ttl
+        self._pool = SQLitePool(path)
+        with self._pool.connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS recent_objects "
+                "(scope TEXT NOT NULL, name TEXT NOT NULL, used_at REAL NOT NULL, PRIMARY KEY (scope, name)) "
+                "WITHOUT ROWID"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS recent_objects_used_at ON recent_objects (scope, used_at)")
+        logging.info("Using SQLite recent-objects store at %s", path)
+
+    def _cutoff(self):
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def is_recent(self, scope, name):
+        with self._pool.connection() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM recent_objects WHERE scope = ? AND name = ? AND used_at >= ?",
+                (scope, name, self._cutoff())
+            ).fetchone()
+        return row is not None
+
+    def add(self, scope, name):
+        with self._pool.connection() as connection:
+            connection.execute(
+                "INSERT INTO recent_objects (scope, name, used_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(scope, name) DO UPDATE SET used_at = excluded.used_at",
+                (scope, name, time.time()),
+            )
+            connection.execute("DELETE FROM recent_objects WHERE scope = ? AND used_at < ?", (scope, self._cutoff()))
+            connection.execute(
+                "DELETE FROM recent_objects WHERE scope = ? AND name IN (SELECT name FROM recent_objects "
+                "WHERE scope = ? ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (scope, scope, self.window)
+            )
+
+    def __len__(self):
+        with self._pool.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM recent_objects").fetchone()[0]
+
+
+def create_recent_objects(backend, path=None, window=50, ttl=None):
+    """Builds the recent-objects store named by backend ('memory' or 'sqlite')."""
+    if backend == "memory":
+        return MemoryRecentObjects(window, ttl)
+    if backend == "sqlite":
+        return SQLiteRecentObjects(path, window, ttl)
+    raise ValueError(f"Unknown recent-objects backend {backend!r}, expected 'memory' or 'sqlite'")
@@ -0,0 +1,343 @@
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from collections.abc import MutableMapping
+
+from backend.sqlite_pool import SQLitePool
+
+# Serialized sessions above this size are zlib-compressed before they are written
+COMPRESS_OVER_BYTES = 1024
+# Conditional writes retried after another writer stored the session first
+SAVE_RETRIES = 5
+
+
+def dump_session(user_session):
+    """Serializes a session to compact JSON bytes, compressing large ones."""
+    data = json.dumps(user_session.to_dict(), separators=(",", ":"), ensure_ascii=False).encode()
+    if len(data) > COMPRESS_OVER_BYTES:
+        return zlib.compress(data, 1)
+    return data
+
+
+def load_session(session_class, data):
+    """Inverse of dump_session. Plain JSON always starts with '{', so anything else is compressed."""
+    if data[:1] != b"{":
+        data = zlib.decompress(data)
+    return session_class.from_dict(json.loads(data))
+
+
+class EvictingSessionStore(MutableMapping, ABC):
+    """Shared eviction settings, counters and background cleanup for the session stores.
+
+    ttl drops sessions idle for that many seconds, max_sessions and max_bytes cap how many
+    sessions (and how many bytes of them) stay resident, least recently used going first.
+    Any limit left as None is not enforced.
+    """
+
+    def __init__(self, ttl=None, max_sessions=None, max_bytes=None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.evictions = Counter()  # by reason: "ttl", "max_sessions", "max_bytes"
+        self._cleanup_thread = None
+
+    @abstractmethod
+    def evict(self):
+        """Drops expired sessions and enforces the limits. Called periodically by the cleanup thread."""
+
+    @abstractmethod
+    def resident_bytes(self):
+        """Bytes taken by the stored sessions."""
+
+    def save(self, user_id, user_session, merge=None):
+        """Stores a session that was loaded earlier, unless another writer stored it in the meantime.
+
+        On such a conflict merge(user_session, stored), if given, pulls the other writer's changes into
+        user_session, and the write is tried again on top of the stored copy. Returns False if it never landed.
+        """
+        for _ in range(SAVE_RETRIES):
+            if self._write_if_unchanged(user_id, user_session):
+                return True
+            stored = self.get(user_id)
+            if stored is None:
+                user_session.version = None
+            else:
+                if merge is not None:
+                    merge(user_session, stored)
+                user_session.version = stored.version
+        logging.warning("Session %s kept changing - gave up saving it", user_id)
+        return False
+
+    def update(self, user_id, change):
+        """Applies change(user_session) to the latest stored copy of a session and stores the result.
+
+        The whole load-change-store is retried if another writer got in between, so nothing they stored is
+        overwritten. change may return False to leave the session as it is. Returns the session, or None if
+        it doesn't exist (or kept changing).
+        """
+        for _ in range(SAVE_RETRIES):
+            user_session = self.get(user_id)
+            if user_session is None or change(user_session) is False:
+                return user_session
+            if self._write_if_unchanged(user_id, user_session):
+                return user_session
+        logging.warning("Session %s kept changing - gave up updating it", user_id)
+        return None
+
+    @abstractmethod
+    def _write_if_unchanged(self, user_id, user_session):
+        """Stores the session only if the stored copy is still user_session.version. Returns whether it did."""
+
+    def stats(self):
+        return {
+            "sessions": len(self),
+            "resident_bytes": self.resident_bytes(),
+            "evictions": dict(self.evictions),
+        }
+
+    def start_cleanup(self, interval):
+        """Runs evict() every interval seconds in a daemon thread (once per process)."""
+        thread = self._cleanup_thread
+        if thread is not None and thread.is_alive() and self._cleanup_pid == os.getpid():
+            return
+        self._cleanup_pid = os.getpid()
+        self._cleanup_thread = threading.Thread(target=self._cleanup_forever, args=(interval,),
+                                                name="session-cleanup", daemon=True)
+        self._cleanup_thread.start()
+
+    def _cleanup_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                before = sum(self.evictions.values())
+                self.evict()
+                evicted = sum(self.evictions.values()) - before
+                if evicted:
+                    logging.info("Session cleanup evicted %d sessions: %s", evicted, self.stats())
+            except Exception as e:
+                logging.error("Session cleanup failed: %s", e)
+
+
+class MemorySessionStore(EvictingSessionStore):
+    """Sessions kept in this process only. Fast, but every gunicorn worker has its own copy.
+
+    Entries are kept in least-recently-used order, so both the TTL sweep and the size limits only
+    ever look at the front of the queue (amortized O(1) per eviction).
+    """
+
+    def __init__(self, ttl=None, max_sessions=None, max_bytes=None, sizeof=None):
+        super().__init__(ttl, max_sessions, max_bytes)
+        self.sizeof = sizeof or (lambda user_session: 0)
+        self._sessions = OrderedDict()  # user_id -> (session, last_seen, size), oldest first
+        self._resident_bytes = 0
+        self._lock = threading.RLock()
+
+    def __getitem__(self, user_id):
+        now = time.time()
+        with self._lock:
+            user_session, last_seen, size = self._sessions[user_id]
+            if self.ttl is not None and last_seen < now - self.ttl:
+                self._drop(user_id, "ttl")
+                raise KeyError(user_id)
+            self._sessions[user_id] = (user_session, now, size)
+            self._sessions.move_to_end(user_id)
+            return user_session
+
+    def __setitem__(self, user_id, user_session):
+        size = self.sizeof(user_session)
+        with self._lock:
+            previous = self._sessions.pop(user_id, None)
+            if previous is not None:
+                self._resident_bytes -= previous[2]
+            self._sessions[user_id] = (user_session, time.time(), size)
+            self._resident_bytes += size
+            self._evict_over_limits()
+
+    def __delitem__(self, user_id):
+        with self._lock:
+            self._drop(user_id)
+
+    def update(self, user_id, change):
+        # Every reader shares the one live object, so holding the lock is enough
+        with self._lock:
+            return super().update(user_id, change)
+
+    def _write_if_unchanged(self, user_id, user_session):
+        self[user_id] = user_session
+        return True
+
+    def __iter__(self):
+        return iter(list(self._sessions))
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def resident_bytes(self):
+        return self._resident_bytes
+
+    def evict(self):
+        with self._lock:
+            if self.ttl is not None:
+                cutoff = time.time() - self.ttl
+                while self._sessions:
+                    user_id, (_, last_seen, _) = next(iter(self._sessions.items()))
+                    if last_seen >= cutoff:
+                        break
+                    self._drop(user_id, "ttl")
+            self._evict_over_limits()
+
+    def _evict_over_limits(self):
+        while self.max_sessions is not None and len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)), "max_sessions")
+        # Never evict the session that was just written, even if it alone is over budget
+        while self.max_bytes is not None and self._resident_bytes > self.max_bytes and len(self._sessions) > 1:
+            self._drop(next(iter(self._sessions)), "max_bytes")
+
+    def _drop(self, user_id, reason=None):
+        _, _, size = self._sessions.pop(user_id)
+        self._resident_bytes -= size
+        if reason:
+            self.evictions[reason] += 1
+
+
+class SQLiteSessionStore(EvictingSessionStore):
+    """Sessions in a SQLite file (WAL mode) that every worker on the machine reads and writes.
+
+    Each lookup loads a fresh copy of the session; changes are only shared once it is stored again,
+    so callers do one read-modify-write per request. Every write bumps the row's version, and the copy
+    carries the version it was loaded at (in user_session.version), so save() and update() can tell
+    when someone else stored the session in between. Expired rows are invisible to lookups right away
+    and deleted by evict(), which also trims the oldest rows when the limits are exceeded.
+    """
+
+    def __init__(self, path, session_class, ttl=None, max_sessions=None, max_bytes=None):
+        super().__init__(ttl, max_sessions, max_bytes)
+        self.path = path
+        self.session_class = session_class
+        self._pool = SQLitePool(path)
+        with self._pool.connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(id TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, updated_at REAL NOT NULL, "
+                "version INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(sessions)")}
+            if "version" not in columns:
+                connection.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        logging.info("Using SQLite session store at %s", path)
+
+    def _cutoff(self):
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def __getitem__(self, user_id):
+        with self._pool.connection() as connection:
+            row = connection.execute(
+                "SELECT data, version FROM sessions WHERE id = ? AND updated_at >= ?", (user_id, self._cutoff())
+            ).fetchone()
+        if row is None:
+            raise KeyError(user_id)
+        user_session = load_session(self.session_class, row[0])
+        user_session.version = row[1]
+        return user_session
+
+    def __setitem__(self, user_id, user_session):
+        """Stores the session whatever was stored before (see save() for the conditional write)."""
+        data = dump_session(user_session)
+        with self._pool.connection() as connection:
+            connection.execute(
+                "INSERT INTO sessions (id, data, size, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET data = excluded.data, size = excluded.size, "
+                "updated_at = excluded.updated_at, version = sessions.version + 1",
+                (user_id, data, len(data), time.time()),
+            )
+
+    def _write_if_unchanged(self, user_id, user_session):
+        data = dump_session(user_session)
+        with self._pool.connection() as connection:
+            if user_session.version is None:
+                # Never stored: only insert, so a session someone else created meanwhile isn't replaced
+                cursor = connection.execute(
+                    "INSERT INTO sessions (id, data, size, updated_at) VALUES (?, ?, ?, ?) ON CONFLICT(id) DO NOTHING",
+                    (user_id, data, len(data), time.time()),
+                )
+                version = 0
+            else:
+                cursor = connection.execute(
+                    "UPDATE sessions SET data = ?, size = ?, updated_at = ?, version = version + 1 "
+                    "WHERE id = ? AND version = ?",
+                    (data, len(data), time.time(), user_id, user_session.version),
+                )
+                version = user_session.version + 1
+        if cursor.rowcount != 1:
+            return False
+        user_session.version = version
+        return True
+
+    def __delitem__(self, user_id):
+        with self._pool.connection() as connection:
+            cursor = connection.execute("DELETE FROM sessions WHERE id = ?", (user_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(user_id)
+
+    def __contains__(self, user_id):
+        with self._pool.connection() as connection:
+            row = connection.execute(
+                "SELECT 1 FROM sessions WHERE id = ? AND updated_at >= ?", (user_id, self._cutoff())
+            ).fetchone()
+        return row is not None
+
+    def __iter__(self):
+        with self._pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT id FROM sessions WHERE updated_at >= ?", (self._cutoff(),)
+            ).fetchall()
+        for (user_id,) in rows:
+            yield user_id
+
+    def __len__(self):
+        with self._pool.connection() as connection:
+            return connection.execute(
+                "SELECT COUNT(*) FROM sessions WHERE updated_at >= ?", (self._cutoff(),)
+            ).fetchone()[0]
+
+    def clear(self):
+        with self._pool.connection() as connection:
+            connection.execute("DELETE FROM sessions")
+
+    def resident_bytes(self):
+        with self._pool.connection() as connection:
+            return connection.execute("SELECT COALESCE(SUM(size), 0) FROM sessions").fetchone()[0]
+
+    def evict(self):
+        with self._pool.connection() as connection:
+            if self.ttl is not None:
+                cursor = connection.execute("DELETE FROM sessions WHERE updated_at < ?", (self._cutoff(),))
+                self.evictions["ttl"] += max(cursor.rowcount, 0)
+            if self.max_sessions is not None:
+                cursor = connection.execute(
+                    "DELETE FROM sessions WHERE id IN (SELECT id FROM sessions ORDER BY updated_at DESC "
+                    "LIMIT -1 OFFSET ?)", (self.max_sessions,)
+                )
+                self.evictions["max_sessions"] += max(cursor.rowcount, 0)
+            if self.max_bytes is not None:
+                # Keep the newest sessions whose running total still fits in the budget
+                cursor = connection.execute(
+                    "DELETE FROM sessions WHERE id IN (SELECT id FROM (SELECT id, SUM(size) OVER "
+                    "(ORDER BY updated_at DESC ROWS UNBOUNDED PRECEDING) AS running FROM sessions) WHERE running > ?)",
+                    (self.max_bytes,)
+                )
+                self.evictions["max_bytes"] += max(cursor.rowcount, 0)
+
+def create_session_store(backend, session_class, path=None, ttl=None, max_sessions=None, max_bytes=None):
+    """Builds the session store named by backend ('memory' or 'sqlite')."""
+    if backend == "memory":
+        return MemorySessionStore(ttl, max_sessions, max_bytes, sizeof=session_class.approx_size)
+    if backend == "sqlite":
+        return SQLiteSessionStore(path, session_class, ttl, max_sessions, max_bytes)
+    raise ValueError(f"Unknown session backend {backend!r}, expected 'memory' or 'sqlite'")
@@ -0,0 +1,47 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# SQLite connections per process and file; callers beyond that wait for one to be returned
+SQLITE_POOL_SIZE = int(os.environ.get("DIVA_SQLITE_POOL_SIZE", 8))
+
+
+def connect_sqlite(path):
+    """Opens a SQLite connection tuned for many processes sharing one file."""
+    connection = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SQLitePool:
+    """A few SQLite connections per process, each lent to one caller at a time.
+
+    A connection per thread (threading.local) would mean a connection per greenlet under gevent, so one
+    per request, never closed. The pool is emptied in a forked child, since connections must not cross a fork.
+    """
+
+    def __init__(self, path, size=SQLITE_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.Semaphore(self.size)
+
+    @contextmanager
+    def connection(self):
+        with self._available:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                connection = connect_sqlite(self.path)
+            try:
+                yield connection
+            finally:
+                with self._lock:
+                    self._idle.append(connection)
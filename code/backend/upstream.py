@@ -0,0 +1,288 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import httpx
+import openai
+from openai import OpenAI
+
+from backend.background import BACKGROUND_WORKERS
+from backend.metrics import (BREAKER_OPEN, UPSTREAM_COALESCED, UPSTREAM_ERRORS, UPSTREAM_SECONDS,
+                             UPSTREAM_SHORT_CIRCUITS, record_usage)
+
+# Provider used when DIVA_LLM_PROVIDER is unset: "openai" for the real API (or any compatible server at
+# DIVA_API_BASE_URL), "mock" for the in-process mock
+DEFAULT_LLM_PROVIDER = "openai"
+
+# Keep-alive connections per worker process. A sync worker has one request thread plus the background
+# executor and the object pool thread; a gevent worker can have DIVA_WORKER_CONNECTIONS requests in flight.
+if os.environ.get("DIVA_SERVING_MODE", "sync") == "async":
+    DEFAULT_POOL_SIZE = int(os.environ.get("DIVA_WORKER_CONNECTIONS", 500))
+else:
+    DEFAULT_POOL_SIZE = 1 + BACKGROUND_WORKERS + 1
+POOL_SIZE = int(os.environ.get("DIVA_UPSTREAM_POOL_SIZE", DEFAULT_POOL_SIZE))
+KEEPALIVE_EXPIRY = float(os.environ.get("DIVA_UPSTREAM_KEEPALIVE", 60))
+
+CONNECT_TIMEOUT = float(os.environ.get("DIVA_UPSTREAM_CONNECT_TIMEOUT", 3))
+# Read timeout (seconds between bytes) and total budget, retries included, per call site. Students wait on
+# the first group; the second runs in the background and can afford to be patient.
+CALL_SITE_LIMITS = {
+    "chat": (20, 30),
+    "chat_stream": (10, 20),  # until the stream opens; each chunk then gets the read timeout again
+    "minigame": (10, 15),
+    "hints": (15, 20),
+    "chat_summary": (30, 60),
+    "answer_sheet": (30, 60),
+}
+DEFAULT_LIMITS = (20, 30)
+
+RETRIES = int(os.environ.get("DIVA_UPSTREAM_RETRIES", 2))
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4.0
+# Below this much time left there is no point starting another attempt
+MIN_ATTEMPT_SECONDS = 0.5
+# Connection failures and timeouts (APITimeoutError is an APIConnectionError), 429s and 5xx responses
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+# Consecutive failed calls (after their retries) that open the breaker, and how long it stays open
+# before a single probe call is let through
+BREAKER_FAILURES = int(os.environ.get("DIVA_BREAKER_FAILURES", 5))
+BREAKER_COOLDOWN = float(os.environ.get("DIVA_BREAKER_COOLDOWN", 30))
+
+
+class UpstreamUnavailable(Exception):
+    """Raised without calling upstream while the circuit breaker is open, or when the caller's deadline leaves
+    no time for an attempt; callers serve a local fallback."""
+
+
+class CircuitBreaker:
+    """Shared by every call site in the process: once upstream keeps failing, calls fail fast.
+
+    closed: calls go through, and BREAKER_FAILURES consecutive outage errors open the breaker.
+    open: calls are refused until the cooldown has passed.
+    half-open: one probe call goes through; success closes the breaker, failure opens it again. A probe that
+    ends without telling either way (a bad request, a cancelled caller) lets the next call probe instead.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half-open"
+                self._probing = False
+            if self.state == "half-open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logging.info("Upstream recovered - closing the circuit breaker")
+                BREAKER_OPEN.set(0)
+            self.state = "closed"
+            self._consecutive_failures = 0
+            self._probing = False
+
+    def release(self):
+        """Ends a call that said nothing about upstream health, so a half-open breaker can probe again."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            self._probing = False
+            if self.state == "half-open" or self._consecutive_failures >= self.failures:
+                if self.state != "open":
+                    logging.warning("Upstream failing (%d in a row) - opening the circuit breaker for %.0fs",
+                                    self._consecutive_failures, self.cooldown)
+                    BREAKER_OPEN.set(1)
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class SingleFlight:
+    """Runs one call per key at a time: callers arriving while it is in flight wait for it and share its result."""
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, call, timeout=None):
+        """Returns (result, shared). Exceptions are shared the same way results are.
+
+        A caller that joins an in-flight call waits at most timeout seconds for it, then gets FutureTimeout.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            return future.result(timeout), True
+        try:
+            future.set_result(call())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result(), False
+
+
+def request_key(kwargs):
+    """The canonical form of a completion request: model, messages and parameters, in a stable order."""
+    payload = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def build_client(api_key=None, base_url=None, transport=None):
+    """The shared OpenAI client: a keep-alive pool sized to the worker, explicit timeouts, no hidden retries."""
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE,
+                            keepalive_expiry=KEEPALIVE_EXPIRY),
+        timeout=httpx.Timeout(DEFAULT_LIMITS[0], connect=CONNECT_TIMEOUT),
+        transport=transport,
+    )
+    return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client, max_retries=0)
+
+
+def create_client(provider=None, api_key=None, base_url=None):
+    """Client for provider, by default DIVA_LLM_PROVIDER read when called (so after load_dotenv()).
+
+    The mock answers in-process with the DIVA_MOCK_* settings; it is only imported when selected.
+    """
+    provider = provider or os.environ.get("DIVA_LLM_PROVIDER", DEFAULT_LLM_PROVIDER)
+    if provider == "mock":
+        from backend.mock_llm import MOCK_BASE_URL, MockLLM
+
+        return build_client(api_key="mock", base_url=MOCK_BASE_URL, transport=MockLLM().transport())
+    if provider == "openai":
+        return build_client(api_key, base_url)
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+def backoff(attempt):
+    """Full-jitter exponential backoff before retry number attempt (1, 2, ...)."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class Upstream:
+    """The one way the app calls the chat completions API, so every call is timed and accounted for.
+
+    call_site names the caller (chat, minigame, hints, ...) in the metrics and picks its timeouts.
+    Failed attempts are retried with jittered backoff as long as the call's deadline allows another one;
+    deadline is an absolute time.monotonic() value, e.g. the end of the student's request.
+    While the circuit breaker is open, calls raise UpstreamUnavailable right away.
+    Identical completions requested from the same call site while one is already in flight share that call
+    instead of starting their own, waiting for it no longer than their own deadline.
+    observe, if given, is called with (call_site, seconds) for the time each caller spent waiting on upstream.
+    """
+
+    def __init__(self, client, breaker=None, observe=None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.observe = observe
+        self.single_flight = SingleFlight()
+
+    def complete(self, call_site, deadline=None, **kwargs):
+        start = time.monotonic()
+        led = False
+
+        def call():
+            nonlocal led
+            led = True
+            return self._call(call_site, deadline, kwargs)
+
+        # Keyed on the call site as well, so callers only share a call made with their own timeouts and budget;
+        # one that joins stops waiting at its own deadline
+        key = (call_site, request_key(kwargs))
+        wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            completion, shared = self.single_flight.do(key, call, timeout=wait)
+        except FutureTimeout:
+            raise UpstreamUnavailable(call_site) from None
+        finally:
+            # The leading caller's attempts are timed in _attempts. Callers that joined it waited on upstream
+            # just the same, whether the shared call succeeded or raised.
+            if not led:
+                UPSTREAM_COALESCED.labels(call_site).inc()
+                if self.observe is not None:
+                    self.observe(call_site, time.monotonic() - start)
+        if not shared:
+            record_usage(call_site, completion.usage)
+        return completion
+
+    def stream(self, call_site, deadline=None, **kwargs):
+        """Opens a streamed completion. Latency is the time to open the stream; usage arrives in its last chunk."""
+        return self._call(call_site, deadline, dict(kwargs, stream=True, stream_options={"include_usage": True}))
+
+    def _call(self, call_site, deadline, kwargs):
+        if deadline is not None and deadline - time.monotonic() < MIN_ATTEMPT_SECONDS:
+            # Checked before the breaker, so a caller that ran out of time never takes the half-open probe
+            UPSTREAM_ERRORS.labels(call_site).inc()
+            raise UpstreamUnavailable(call_site)
+        if not self.breaker.allow():
+            UPSTREAM_SHORT_CIRCUITS.labels(call_site).inc()
+            raise UpstreamUnavailable(call_site)
+        healthy = None
+        try:
+            result = self._attempts(call_site, deadline, kwargs)
+            healthy = True
+            return result
+        except RETRYABLE_ERRORS:
+            healthy = False
+            raise
+        finally:
+            if healthy is True:
+                self.breaker.record_success()
+            elif healthy is False:
+                self.breaker.record_failure()
+            else:
+                # A bad request or a cancelled caller (GreenletExit, a gevent Timeout) says nothing about
+                # upstream health, but must not leave a half-open probe hanging
+                self.breaker.release()
+
+    def _attempts(self, call_site, deadline, kwargs):
+        read_timeout, budget = CALL_SITE_LIMITS.get(call_site, DEFAULT_LIMITS)
+        start = time.monotonic()
+        deadline = min(deadline or float("inf"), start + budget)
+        attempt = 0
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                timeout = httpx.Timeout(min(read_timeout, remaining), connect=min(CONNECT_TIMEOUT, remaining))
+                try:
+                    return self.client.chat.completions.create(timeout=timeout, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    attempt += 1
+                    delay = backoff(attempt)
+                    if attempt > RETRIES or deadline - time.monotonic() - delay < MIN_ATTEMPT_SECONDS:
+                        raise
+                    logging.warning("Upstream %s attempt %d failed (%s), retrying in %.2fs",
+                                    call_site, attempt, type(e).__name__, delay)
+                    time.sleep(delay)
+        except Exception:
+            UPSTREAM_ERRORS.labels(call_site).inc()
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            UPSTREAM_SECONDS.labels(call_site).observe(elapsed)
+            if self.observe is not None:
+                self.observe(call_site, elapsed)
@@ -0,0 +1,60 @@
+"""Input tokens per /api/chat request as a conversation grows: full history vs. the token-budgeted window.
+
+Simulates a student chatting turn by turn. The windowed column assumes the background summary has
+caught up, so folded turns are replaced by a summary of ~120 words.
+
+Run from the code/ directory:
+    python -m benchmarks.chat_context --turns 60 --budget 1200
+"""
+import argparse
+
+from backend.chat_context import estimate_tokens, window_messages
+
+SYSTEM_PROMPT = "x" * 1200  # about the size of diva_system_message
+USER_MESSAGE = "Can you explain how chatbots decide what to say next, but like I'm twelve?"
+ASSISTANT_MESSAGE = "Oh sweetie, " + "they predict the next word from patterns they learned, " * 4
+SUMMARY = "word " * 120
+
+
+def tokens(messages):
+    return sum(estimate_tokens(message["content"]) for message in messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--budget", type=int, default=1200)
+    args = parser.parse_args()
+
+    history = [{"role": "system", "content": SYSTEM_PROMPT}]
+    summary = ""
+    windowed_history = list(history)
+    total_full = total_windowed = 0
+
+    print(f"{'turn':>5} {'full':>8} {'windowed':>9}")
+    for turn in range(1, args.turns + 1):
+        user = {"role": "user", "content": USER_MESSAGE}
+        history.append(user)
+        windowed_history.append(user)
+
+        full = tokens(history)
+        messages, dropped = window_messages(windowed_history, summary, args.budget)
+        windowed = tokens(messages)
+        total_full += full
+        total_windowed += windowed
+        if turn % 5 == 0 or turn == 1:
+            print(f"{turn:>5} {full:>8} {windowed:>9}")
+
+        if dropped:  # what refresh_chat_summary does once the background call returns
+            del windowed_history[1:1 + dropped]
+            summary = SUMMARY
+        assistant = {"role": "assistant", "content": ASSISTANT_MESSAGE}
+        history.append(assistant)
+        windowed_history.append(assistant)
+
+    print(f"total input tokens over {args.turns} turns: full {total_full}, windowed {total_windowed} "
+          f"({total_windowed / total_full:.0%})")
+
+
+if __name__ == "__main__":
+    main()
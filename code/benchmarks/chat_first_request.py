@@ -0,0 +1,95 @@
+"""First-request cost of /api/chat with eager vs. lazy session state.
+
+"eager" reproduces the old UserSession, which built the minigame state for every
+visitor. "lazy" is the current behaviour. Secret objects now come from the local
+catalog, so both answer about as fast; what eager still costs is a catalog draw
+per visitor (filling the recent-objects window), a bigger session, and the batch
+of hints every new game prefetches in the background. Upstream calls, including
+the chat replies, are counted once those background refills have finished.
+The secret object pool is disabled, so no answer sheets are built for pooled objects.
+
+Run from the code/ directory:
+    python -m benchmarks.chat_first_request --users 40 --upstream-latency 0.8
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ["SECRET_OBJECT_POOL_SIZE"] = "0"
+os.environ["DIVA_SESSION_BACKEND"] = "memory"  # measure the in-process footprint
+os.environ["DIVA_LLM_PROVIDER"] = "mock"  # replaced per run below; keeps the import from needing a key
+
+from backend import diva  # noqa: E402
+from backend.mock_llm import MOCK_BASE_URL, MockLLM  # noqa: E402
+from backend.upstream import build_client  # noqa: E402
+
+
+def footprint(obj, shared):
+    """Bytes held by one session, not counting the system prompts every session shares."""
+    if id(obj) in shared or obj is None:
+        return 0
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(footprint(k, shared) + footprint(v, shared) for k, v in obj.items())
+    elif isinstance(obj, list):
+        size += sum(footprint(item, shared) for item in obj)
+    elif hasattr(obj, "__slots__"):
+        size += sum(footprint(getattr(obj, name), shared) for name in obj.__slots__)
+    return size
+
+
+def run(mode, users, latency):
+    mock = MockLLM(latency=latency)
+    diva.upstream.client = build_client(api_key="mock", base_url=MOCK_BASE_URL, transport=mock.transport())
+    diva.user_sessions.clear()
+
+    original_init = diva.UserSession.__init__
+    if mode == "eager":
+        def eager_init(self):
+            original_init(self)
+            self.minigame  # build the minigame section up front, like before
+        diva.UserSession.__init__ = eager_init
+
+    timings = []
+    try:
+        for _ in range(users):
+            client = diva.app.test_client()
+            start = time.perf_counter()
+            response = client.post("/api/chat", json={"prompt": "Hi Diva!"})
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_data(as_text=True)
+    finally:
+        diva.UserSession.__init__ = original_init
+
+    deadline = time.time() + 60
+    while diva.hint_refills_in_progress and time.time() < deadline:
+        time.sleep(0.05)
+
+    shared = {id(diva.diva_system_message), id(diva.minigame_system_message)}
+    session_bytes = [footprint(s, shared) for s in diva.user_sessions.values()]
+    return {
+        "mode": mode,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p95_ms": sorted(timings)[int(len(timings) * 0.95) - 1] * 1000,
+        "upstream_calls": mock.stats.get("requests", 0),
+        "session_bytes": statistics.mean(session_bytes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--upstream-latency", type=float, default=0.8, help="seconds per fake upstream call")
+    args = parser.parse_args()
+
+    print(f"{'mode':<6} {'mean ms':>9} {'p95 ms':>9} {'upstream':>9} {'session B':>10}")
+    for mode in ("eager", "lazy"):
+        result = run(mode, args.users, args.upstream_latency)
+        print(f"{result['mode']:<6} {result['mean_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['upstream_calls']:>9} {result['session_bytes']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Cold-start time of `gunicorn backend.diva:app`.
+
+Boots a single-worker gunicorn, times how long it takes until the first HTTP
+request is answered, shuts it down, and repeats. DIVA_SPACY_MODEL picks the
+spaCy model (a package name or a path), as it does for the app.
+
+Run from the code/ directory:
+    python -m benchmarks.cold_start --runs 5
+"""
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def boot_once(timeout):
+    port = free_port()
+    env = dict(os.environ)
+    env.setdefault("DIVA_API_KEY", "sk-benchmark")
+    env["SECRET_OBJECT_POOL_SIZE"] = "0"  # keep the pool from calling upstream during the measurement
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "backend.diva:app", "-w", "1", "-b", f"127.0.0.1:{port}"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited during boot:\n{server.stderr.read().decode()}")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+            except urllib.error.HTTPError:
+                pass  # any HTTP answer (404 here) means the worker is serving
+            except OSError:
+                time.sleep(0.01)
+                continue
+            return time.perf_counter() - start
+        raise RuntimeError(f"gunicorn did not answer within {timeout}s")
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    timings = []
+    for run in range(args.runs):
+        timings.append(boot_once(args.timeout))
+        print(f"run {run + 1}: {timings[-1]:.2f}s")
+    print(f"cold start: median {statistics.median(timings):.2f}s, min {min(timings):.2f}s, max {max(timings):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
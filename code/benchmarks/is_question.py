@@ -0,0 +1,59 @@
+"""CPU cost of is_question(): full en_core_web_sm pipeline vs. the tiered detector.
+
+Run from the code/ directory:
+    python -m benchmarks.is_question --rounds 50
+"""
+import argparse
+import time
+
+from backend.nlp import PARSER_ONLY_EXCLUDE, QuestionDetector, load_spacy_model
+
+# Typical classroom input, including statements and repeats
+SAMPLE_INPUTS = [
+    "is it alive", "is it food", "does it have wheels", "can you eat it", "is it bigger than a car",
+    "it is made of metal", "would i find it in a kitchen", "i think it is a phone", "tell me about it",
+    "is it electronic?", "do people wear it", "my guess is umbrella", "it has wheels", "is it a tool",
+    "what color is it", "hmm", "you can hold it", "is it found outdoors", "does it make noise", "pizza",
+]
+
+
+def full_pipeline_is_question(nlp, user_input):
+    """The original implementation, for comparison."""
+    doc = nlp(user_input)
+    if doc[0].text.lower() in {"who", "what", "when", "where", "why", "how", "is", "does", "do", "can", "could",
+                               "would", "should", "will", "are", "was", "were"}:
+        return True
+    if user_input.strip().endswith("?"):
+        return True
+    return any(token.dep_ == "aux" and token.head.dep_ == "ROOT" for token in doc)
+
+
+def cpu_time(fn, rounds):
+    start = time.process_time()
+    for _ in range(rounds):
+        for user_input in SAMPLE_INPUTS:
+            fn(user_input)
+    return (time.process_time() - start) / (rounds * len(SAMPLE_INPUTS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    full = load_spacy_model()
+    detector = QuestionDetector(load_spacy_model(exclude=PARSER_ONLY_EXCLUDE))
+    uncached = QuestionDetector(detector.model, cache_size=0)
+
+    baseline = cpu_time(lambda text: full_pipeline_is_question(full, text), args.rounds)
+    tiered = cpu_time(uncached, args.rounds)
+    memoized = cpu_time(detector, args.rounds)
+
+    print(f"full pipeline:      {baseline * 1e6:9.1f} us/call")
+    print(f"tiered, no memo:    {tiered * 1e6:9.1f} us/call ({baseline / tiered:.1f}x)")
+    print(f"tiered + LRU memo:  {memoized * 1e6:9.1f} us/call ({baseline / memoized:.1f}x)")
+    print(f"memo: {detector.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
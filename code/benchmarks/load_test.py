@@ -0,0 +1,262 @@
+"""Load test: classroom traffic on every /api route, across worker counts and serving modes.
+
+Boots `gunicorn backend.diva:app` once per (serving mode, worker count) with the in-process mock LLM
+(DIVA_LLM_PROVIDER=mock), so upstream latency is simulated inside each worker and nothing leaves the machine.
+Simulated students then play for --duration seconds, each with their own session. A student mostly asks
+minigame questions, and sometimes chats, asks for a hint or starts a new game; --mix sets the weights.
+
+Every request's latency is split using the Server-Timing header into upstream time (waiting on the
+mock) and app time (everything else). Per route it reports throughput, errors and p50/p95/p99 of the
+total, app and upstream times. Results are written as JSON. Pass --compare with an earlier file to see
+the change per route. benchmarks/results/load_test-sample.json is a short run on one CPU (20 students,
+15 s per run) to compare against.
+
+Run from the code/ directory:
+    python -m benchmarks.load_test --students 40 --duration 30 --workers 1,2 --modes sync,async
+    python -m benchmarks.load_test --workers 2 --modes async --compare benchmarks/results/<earlier run>.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.cold_start import free_port
+
+CONFIG = os.path.join(os.path.dirname(__file__), "..", "..", "gunicorn.conf.py")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+DEFAULT_MIX = "minigame=70,chat=15,hint=10,reset=5"
+QUESTIONS = ["is it alive", "is it bigger than a car", "can you eat it", "is it found in a kitchen",
+             "is it made of metal", "does it use electricity", "can you hold it in one hand", "is it soft",
+             "is it used outdoors", "is it older than 100 years", "is it a phone", "is it an umbrella"]
+CHAT_PROMPTS = ["Hi Diva!", "What is AI?", "Can you tell me a joke?", "How do computers learn?",
+                "What should I name my cat?"]
+SERVER_TIMING = re.compile(r"(\w+);dur=([\d.]+)")
+
+
+def parse_mix(text):
+    routes, weights = [], []
+    for item in text.split(","):
+        route, _, weight = item.partition("=")
+        routes.append(route.strip())
+        weights.append(float(weight))
+    return routes, weights
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def boot(mode, workers, args, db_dir):
+    port = free_port()
+    env = dict(os.environ, DIVA_SERVING_MODE=mode, WEB_CONCURRENCY=str(workers), DIVA_LLM_PROVIDER="mock",
+               DIVA_MOCK_LATENCY=str(args.upstream_latency), DIVA_MOCK_LATENCY_SIGMA=str(args.upstream_sigma),
+               DIVA_MOCK_ERROR_RATE=str(args.upstream_error_rate), DIVA_MOCK_SEED="1",
+               DIVA_SESSION_DB=os.path.join(db_dir, f"{mode}-{workers}.sqlite3"),
+               DIVA_LOG_SAMPLE_RATE="0", DIVA_LOG_LEVEL="WARNING")
+    env.setdefault("FLASK_SECRET_KEY", "benchmark")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "backend.diva:app", "-c", CONFIG, "-b", f"127.0.0.1:{port}",
+         "--timeout", "300"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+        except urllib.error.HTTPError:
+            return server, port
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError(f"gunicorn ({mode}, {workers} workers) did not come up")
+
+
+class Student:
+    """One simulated student with their own cookies. The app's cookies are Secure, which urllib's cookie jar
+    won't send over plain HTTP, so they are kept and sent by hand."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookies = {}
+
+    def post(self, path, payload):
+        headers = {"Content-Type": "application/json"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        request = urllib.request.Request(f"http://127.0.0.1:{self.port}{path}", data=json.dumps(payload).encode(),
+                                         headers=headers, method="POST")
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                response.read()
+                status, response_headers = response.status, response.headers
+        except urllib.error.HTTPError as e:
+            e.read()
+            status, response_headers = e.code, e.headers
+        except OSError:
+            return time.perf_counter() - start, 0, {}
+        elapsed = time.perf_counter() - start
+        for cookie in response_headers.get_all("Set-Cookie") or []:
+            name, _, rest = cookie.partition("=")
+            self.cookies[name] = rest.split(";", 1)[0]
+        server_timing = response_headers.get("Server-Timing", "")
+        timing = {name: float(ms) / 1000 for name, ms in SERVER_TIMING.findall(server_timing)}
+        return elapsed, status, timing
+
+    def request(self, route):
+        if route == "minigame":
+            return self.post("/api/minigame", {"prompt": random.choice(QUESTIONS)})
+        if route == "chat":
+            return self.post("/api/chat", {"prompt": random.choice(CHAT_PROMPTS)})
+        if route == "hint":
+            return self.post("/api/hint", {})
+        if route == "reset":
+            return self.post("/api/reset", {})
+        raise ValueError(f"Unknown route: {route}")
+
+
+def drive(port, args):
+    """Runs the students until the duration is up. Returns (route, seconds, status, timing) per request."""
+    routes, weights = parse_mix(args.mix)
+    samples = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    def play(_):
+        student = Student(port)
+        # Stagger the first requests over a second, like a class opening the page
+        time.sleep(random.random())
+        student.request("reset")
+        while time.perf_counter() < stop_at:
+            route = random.choices(routes, weights)[0]
+            elapsed, status, timing = student.request(route)
+            with lock:
+                samples.append((route, elapsed, status, timing))
+            time.sleep(random.uniform(0, 2 * args.think_time))
+
+    with ThreadPoolExecutor(max_workers=args.students) as pool:
+        list(pool.map(play, range(args.students)))
+    return samples
+
+
+def summarize(samples, duration):
+    def stats(rows):
+        result = {"requests": len(rows), "throughput": round(len(rows) / duration, 2),
+                  "errors": sum(1 for _, _, status, _ in rows if status == 0 or status >= 500)}
+        for name, values in (("total", [elapsed for _, elapsed, _, _ in rows]),
+                             ("app", [timing["app"] for _, _, _, timing in rows if "app" in timing]),
+                             ("upstream", [timing["upstream"] for _, _, _, timing in rows if "upstream" in timing])):
+            for label, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                value = percentile(values, fraction)
+                result[f"{name}_{label}_ms"] = None if value is None else round(value * 1000, 1)
+        return result
+
+    routes = sorted({route for route, _, _, _ in samples})
+    summary = {route: stats([row for row in samples if row[0] == route]) for route in routes}
+    summary["all"] = stats(samples)
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_run(run):
+    print(f"\n{run['mode']} x {run['workers']} worker(s)")
+    print(f"{'route':<9} {'req/s':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'app p95':>8} {'up p95':>8}")
+    for route, row in run["routes"].items():
+        print(f"{route:<9} {row['throughput']:>7.1f} {row['errors']:>6} {row['total_p50_ms'] or 0:>8.0f} "
+              f"{row['total_p95_ms'] or 0:>8.0f} {row['total_p99_ms'] or 0:>8.0f} {row['app_p95_ms'] or 0:>8.0f} "
+              f"{row['upstream_p95_ms'] or 0:>8.0f}")
+
+
+def compare(baseline_path, results):
+    """Prints the change in throughput and p95 per run and route against an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(run["mode"], run["workers"]): run["routes"] for run in baseline["runs"]}
+    print(f"\nCompared with {baseline['commit']} ({baseline_path})")
+    print(f"{'run':<10} {'route':<9} {'req/s':>14} {'p95 ms':>16} {'app p95 ms':>16}")
+    for run in results["runs"]:
+        old_routes = before.get((run["mode"], run["workers"]))
+        if old_routes is None:
+            continue
+        for route, row in run["routes"].items():
+            old = old_routes.get(route)
+            if old is None:
+                continue
+            print(f"{run['mode'] + ' x' + str(run['workers']):<10} {route:<9} "
+                  f"{old['throughput']:>6.1f} -> {row['throughput']:<6.1f}"
+                  f"{old['total_p95_ms'] or 0:>7.0f} -> {row['total_p95_ms'] or 0:<7.0f}"
+                  f"{old['app_p95_ms'] or 0:>7.0f} -> {row['app_p95_ms'] or 0:<7.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=40, help="simulated students playing at once")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per run")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between a student's requests")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--workers", default="1,2", help="comma-separated worker counts")
+    parser.add_argument("--modes", default="sync,async", help="comma-separated DIVA_SERVING_MODE values")
+    parser.add_argument("--upstream-latency", type=float, default=0.8, help="median mock upstream seconds")
+    parser.add_argument("--upstream-sigma", type=float, default=0.3, help="lognormal spread of upstream latency")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/load_test-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    results = {
+        "commit": commit,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "settings": vars(args),
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as db_dir:
+        for mode in args.modes.split(","):
+            for workers in (int(count) for count in args.workers.split(",")):
+                server, port = boot(mode, workers, args, db_dir)
+                try:
+                    samples = drive(port, args)
+                finally:
+                    server.send_signal(signal.SIGTERM)
+                    server.wait()
+                run = {"mode": mode, "workers": workers, "routes": summarize(samples, args.duration)}
+                results["runs"].append(run)
+                print_run(run)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load_test-{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Input tokens and upstream latency per minigame call: the old f-string prompt vs. the compiled template.
+
+The old prompt is rebuilt here the way ask_minigame_question used to send it, with the six sections
+that appeared twice and the redundant guideline line. Token counts use tiktoken when it is installed,
+otherwise the estimate from backend.chat_context. With --live the calls go to the real API and the
+prompt_tokens it reports are printed too; otherwise they go to the local mock, which only shows the
+client-side cost of the larger request body.
+
+Run from the code/ directory:
+    python -m benchmarks.minigame_prompt --calls 10
+    python -m benchmarks.minigame_prompt --calls 10 --live
+"""
+import argparse
+import os
+import statistics
+import time
+
+from openai import OpenAI
+
+from backend.chat_context import estimate_tokens
+from backend.prompts import MINIGAME_INTRO, MINIGAME_SECTIONS, render_minigame_prompt
+from backend.mock_llm import MockLLM, base_url
+
+REPEATED_SECTIONS = ["#### Sensory Properties", "#### Origin & Production", "#### Use & Purpose",
+                     "#### Cultural & Social Context", "#### Environmental Impact", "#### Temporal Aspects"]
+REDUNDANT_GUIDELINE = "- Consider its shape, material, color, and function before answering."
+QUESTIONS = ["is it alive", "can it be found in a kitchen", "is it used in the rain", "is it bigger than a car"]
+
+
+def legacy_prompt(secret_object):
+    """The prompt as the old f-string produced it: no separators, duplicated sections, built per call."""
+    sections = dict(MINIGAME_SECTIONS)
+    ordered = list(MINIGAME_SECTIONS)
+    general = [heading for heading, _ in ordered].index("#### General Guidelines")
+    ordered[general:general] = [(heading, sections[heading]) for heading in REPEATED_SECTIONS]
+    ordered[-3] = (ordered[-3][0], ordered[-3][1][:1] + [REDUNDANT_GUIDELINE] + ordered[-3][1][1:])
+    parts = list(MINIGAME_INTRO)
+    for heading, lines in ordered:
+        parts.append(heading + ":")
+        parts.extend(lines)
+    return " ".join(parts).replace("$secret_object", secret_object)
+
+
+def token_counter():
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        return "tiktoken", lambda text: len(encoding.encode(text))
+    except ImportError:
+        return "estimate", estimate_tokens
+
+
+def time_calls(client, prompt_for, secret_object, calls):
+    timings, prompt_tokens = [], []
+    for call in range(calls):
+        question = QUESTIONS[call % len(QUESTIONS)]
+        start = time.perf_counter()
+        completion = client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": prompt_for(secret_object)},
+                {"role": "user", "content": f"Does this object relate to: {question}?"},
+            ]
+        )
+        timings.append(time.perf_counter() - start)
+        if completion.usage is not None:
+            prompt_tokens.append(completion.usage.prompt_tokens)
+    return timings, prompt_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--object", default="umbrella")
+    parser.add_argument("--latency", type=float, default=0.8, help="mock upstream latency in seconds")
+    parser.add_argument("--live", action="store_true", help="call the real API (uses DIVA_API_KEY)")
+    args = parser.parse_args()
+
+    method, count_tokens = token_counter()
+    variants = [("before", legacy_prompt), ("after", render_minigame_prompt)]
+
+    print(f"{'prompt':>7} {'chars':>7} {'tokens':>7}   (token count: {method})")
+    for name, prompt_for in variants:
+        prompt = prompt_for(args.object)
+        print(f"{name:>7} {len(prompt):>7} {count_tokens(prompt):>7}")
+
+    print(f"\n{'prompt':>7} {'build us':>9}")
+    for name, prompt_for in variants:
+        start = time.perf_counter()
+        for _ in range(1000):
+            prompt_for(args.object)
+        print(f"{name:>7} {(time.perf_counter() - start) * 1000:>9.2f}")
+
+    if args.live:
+        client = OpenAI(api_key=os.getenv("DIVA_API_KEY"), base_url=os.getenv("DIVA_API_BASE_URL") or None)
+    else:
+        server = MockLLM(latency=args.latency).serve()
+        client = OpenAI(api_key="mock", base_url=base_url(server))
+
+    print(f"\n{'prompt':>7} {'p50 ms':>8} {'mean ms':>8} {'prompt_tokens':>14}")
+    for name, prompt_for in variants:
+        timings, prompt_tokens = time_calls(client, prompt_for, args.object, args.calls)
+        reported = statistics.mean(prompt_tokens) if args.live and prompt_tokens else float("nan")
+        print(f"{name:>7} {statistics.median(timings) * 1000:>8.0f} {statistics.mean(timings) * 1000:>8.0f} "
+              f"{reported:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Load benchmark: sync vs. async (gevent) serving against a local mock upstream.
+
+Boots `gunicorn backend.diva:app` once per DIVA_SERVING_MODE with the same worker
+count, fires concurrent /api/chat requests at it, and reports throughput and
+latency. Every upstream call goes to the backend.mock_llm HTTP stand-in with a fixed delay.
+
+Run from the code/ directory:
+    python -m benchmarks.serving_modes --concurrency 200 --requests 400 --workers 1
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.cold_start import free_port
+from backend.mock_llm import MockLLM, base_url
+
+CONFIG = os.path.join(os.path.dirname(__file__), "..", "..", "gunicorn.conf.py")
+
+
+def boot(mode, workers, upstream_url):
+    port = free_port()
+    env = dict(os.environ, DIVA_SERVING_MODE=mode, WEB_CONCURRENCY=str(workers), DIVA_API_BASE_URL=upstream_url,
+               SECRET_OBJECT_POOL_SIZE="0")
+    env.setdefault("DIVA_API_KEY", "sk-benchmark")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "backend.diva:app", "-c", CONFIG, "-b", f"127.0.0.1:{port}",
+         "--timeout", "300"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1)
+        except urllib.error.HTTPError:
+            return server, port
+        except OSError:
+            time.sleep(0.05)
+    server.kill()
+    raise RuntimeError(f"gunicorn ({mode}) did not come up")
+
+
+def chat_once(port):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/chat", data=json.dumps({"prompt": "Hi Diva!"}).encode(),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=600) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run(mode, args, upstream_url):
+    server, port = boot(mode, args.workers, upstream_url)
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            latencies = sorted(pool.map(lambda _: chat_once(port), range(args.requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    return {
+        "mode": mode,
+        "throughput": args.requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "max": latencies[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--upstream-latency", type=float, default=0.8)
+    args = parser.parse_args()
+
+    upstream_url = base_url(MockLLM(latency=args.upstream_latency).serve())
+
+    print(f"{'mode':<6} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'max s':>8}")
+    for mode in ("sync", "async"):
+        result = run(mode, args, upstream_url)
+        print(f"{result['mode']:<6} {result['throughput']:>8.1f} {result['p50']:>8.2f} "
+              f"{result['p95']:>8.2f} {result['max']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
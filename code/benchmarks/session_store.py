@@ -0,0 +1,70 @@
+"""Per-request overhead of the session stores (one load + one save, as the app does).
+
+Sessions are filled with a realistic chat and minigame history so serialization
+cost is included. Compare the numbers with upstream latency (~1 s per call).
+
+Run from the code/ directory:
+    python -m benchmarks.session_store --sessions 500 --turns 20
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ["SECRET_OBJECT_POOL_SIZE"] = "0"
+
+from backend import diva  # noqa: E402
+from backend.session_store import MemorySessionStore, SQLiteSessionStore, dump_session  # noqa: E402
+
+
+def make_session(turns):
+    user_session = diva.UserSession()
+    user_session.secret_object = "umbrella"
+    for turn in range(turns):
+        user_session.diva_chat_history.append({"role": "user", "content": f"Tell me something fun #{turn}"})
+        user_session.diva_chat_history.append({"role": "assistant", "content": "Oh honey, " + "sass " * 40})
+        user_session.game_chat_history.append({"role": "user", "content": "is it alive"})
+        user_session.diva_word_count += 42
+    return user_session
+
+
+def measure(store, sessions, requests):
+    for user_session in sessions:
+        store[user_session.id] = user_session
+    ids = [user_session.id for user_session in sessions]
+    timings = []
+    for _ in range(requests):
+        user_id = random.choice(ids)
+        start = time.perf_counter()
+        user_session = store[user_id]
+        user_session.question_count += 1
+        store[user_id] = user_session
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    sessions = [make_session(args.turns) for _ in range(args.sessions)]
+    print(f"serialized session: {statistics.mean(len(dump_session(s)) for s in sessions):.0f} bytes")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            "memory": MemorySessionStore(),
+            "sqlite": SQLiteSessionStore(os.path.join(tmp, "sessions.sqlite3"), diva.UserSession),
+        }
+        for name, store in stores.items():
+            p50, p99 = measure(store, sessions, args.requests)
+            print(f"{name:<7} load+save p50 {p50 * 1e6:8.1f} us   p99 {p99 * 1e6:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
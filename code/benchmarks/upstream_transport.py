@@ -0,0 +1,79 @@
+"""Connection reuse and tail latency: the OpenAI client's defaults vs. the tuned shared transport.
+
+Both clients call the backend.mock_llm HTTP stand-in from a pool of threads, as a worker's request and background
+threads would. A share of the calls stall (--stall-rate, --stall); the default client waits them out
+(its timeout is 10 minutes), the tuned one gives up at the call site's read timeout and retries within
+the call's budget. Connections opened are counted by the mock. Every call asks a different question, so
+the Upstream's coalescing of identical in-flight calls never kicks in and both clients make every call.
+
+Run from the code/ directory:
+    python -m benchmarks.upstream_transport --calls 200 --threads 6 --stall-rate 0.02 --stall 30
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+from backend.mock_llm import MockLLM, base_url
+from backend.upstream import POOL_SIZE, Upstream, build_client
+
+
+def messages(number):
+    return [{"role": "user", "content": f"Does this object relate to: is it alive? (call {number})"}]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(name, make_call, server, calls, threads):
+    def timed_call(number):
+        start = time.perf_counter()
+        try:
+            make_call(number)
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    before = dict(server.stats)
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(timed_call, range(calls)))
+    timings = [elapsed for elapsed, _ in results]
+    errors = sum(1 for _, ok in results if not ok)
+    opened = server.stats.get("connections", 0) - before.get("connections", 0)
+    stalls = server.stats.get("stalls", 0) - before.get("stalls", 0)
+    print(f"{name:>8} {calls:>6} {errors:>7} {stalls:>7} {opened:>6} {statistics.median(timings) * 1000:>8.0f} "
+          f"{percentile(timings, 0.95) * 1000:>8.0f} {percentile(timings, 0.99) * 1000:>8.0f} "
+          f"{max(timings) * 1000:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=POOL_SIZE)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--stall-rate", type=float, default=0.02)
+    parser.add_argument("--stall", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"{'client':>8} {'calls':>6} {'errors':>7} {'stalls':>7} {'conns':>6} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'max ms':>8}")
+
+    server = MockLLM(latency=args.latency, stall_rate=args.stall_rate, stall=args.stall).serve()
+    default_client = OpenAI(api_key="mock", base_url=base_url(server))
+    run("default", lambda number: default_client.chat.completions.create(model="gpt-3.5-turbo",
+                                                                         messages=messages(number)),
+        server, args.calls, args.threads)
+
+    server = MockLLM(latency=args.latency, stall_rate=args.stall_rate, stall=args.stall).serve()
+    upstream = Upstream(build_client(api_key="mock", base_url=base_url(server)))
+    run("tuned", lambda number: upstream.complete("minigame", model="gpt-3.5-turbo", messages=messages(number)),
+        server, args.calls, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+# DIVA_SERVING_MODE picks how each worker serves requests:
+#   sync  - one request at a time per worker; a slow OpenAI call blocks the whole worker
+#   async - gevent workers; the shared OpenAI client's sockets yield while waiting on upstream,
+#           so a single process can hold hundreds of upstream calls in flight
+# Worker count comes from WEB_CONCURRENCY, which gunicorn (and Heroku) already honor.
+serving_mode = os.environ.get("DIVA_SERVING_MODE", "sync")
+
+if serving_mode == "async":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("DIVA_WORKER_CONNECTIONS", 500))
+elif serving_mode != "sync":
+    raise ValueError(f"Unknown DIVA_SERVING_MODE {serving_mode!r}, expected 'sync' or 'async'")
+
+# Workers write their metrics to files in PROMETHEUS_MULTIPROC_DIR so /api/metrics can merge them (backend/metrics.py).
+# It must be set before the app is imported, and start out empty.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "diva-metrics"))
+
+
+def on_starting(server):
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(metrics_dir, exist_ok=True)
+    for name in os.listdir(metrics_dir):
+        if name.endswith(".db"):
+            os.remove(os.path.join(metrics_dir, name))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)